@@ -0,0 +1,38 @@
+import argparse
+import json
+import numpy as np
+import minimax
+from game_records import GameRecordFile
+
+def positions(records, plies):
+    """Yields (game, ply, side to move) with the engine board set to each requested position"""
+    size = records.size
+    for game, record in enumerate(records):
+        board = np.zeros((size, size, size), dtype=np.int32)
+        for ply, ((x, y, z), player) in enumerate(zip(record.moves, record.players()), start=1):
+            board[x - 1, y - 1, z - 1] = player
+            if ply in plies and ply < len(record.moves):
+                minimax.set_board(board)
+                yield game, ply, -player
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-k move analysis of positions from a .c4r game record file")
+    parser.add_argument("records")
+    parser.add_argument("--plies", type=int, nargs="+", default=[8, 16, 24], help="analyse the position after these plies")
+    parser.add_argument("-k", type=int, default=3, help="moves reported per position")
+    parser.add_argument("--time", type=float, default=1.0, help="seconds per position")
+    parser.add_argument("--depth", type=int, default=None)
+    args = parser.parse_args()
+
+    records = GameRecordFile(args.records)
+    minimax.configure(records.size, records.win_length)
+    for game, ply, side in positions(records, set(args.plies)):
+        lines = minimax.analyze(args.k, args.depth, args.time, side)
+        print(json.dumps({
+            "game": game, "ply": ply, "hash": minimax.position_hash,
+            "to_move": "player" if side == minimax.PLAYER else "ai",
+            "lines": [{**line, "score": int(line["score"]), "moves_to_win": int(line["moves_to_win"])} for line in lines],
+        }))
+
+if __name__ == "__main__":
+    main()
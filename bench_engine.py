@@ -0,0 +1,106 @@
+import argparse
+import hashlib
+import time
+import numpy as np
+import minimax
+
+def full_width_search(depth):
+    """Full-width root search for the AI to the given depth, without the ai_move shortcuts"""
+    move_count = int(np.count_nonzero(minimax.board))
+    best = None
+    for x, y, z in minimax.get_valid_moves():
+        minimax.make_move(x, y, z, minimax.AI)
+        score, _ = minimax.minimax(depth, -float('inf'), float('inf'), False, (x, y, z), None, move_count + 1)
+        minimax.undo_move(x, y, z)
+        if best is None or score > best[0]:
+            best = (score, (x, y, z))
+    return best
+
+def bench_size(size, win_length, depth, positions, seed):
+    minimax.configure(size, win_length)
+    rng = np.random.default_rng(seed)
+    nodes = 0
+    elapsed = 0.0
+    for _ in range(positions):
+        minimax.set_board(np.zeros((size, size, size), dtype=np.int32))
+        minimax.random_opening(size, rng)
+        minimax.transposition_table.clear()
+        minimax.nodes_searched = 0
+        start = time.perf_counter()
+        full_width_search(depth)
+        elapsed += time.perf_counter() - start
+        nodes += minimax.nodes_searched
+    return nodes, elapsed
+
+def bench_levels(levels, positions, plies, seed):
+    """Plays ai_move at each level on the same random positions.
+
+    Yields (level, CPU-ms, nodes, depths, digest), where the lists cover the
+    moves that reached the search rather than an ai_move shortcut, nodes counts
+    every node searched, cut-off iterations included, and digest hashes every
+    chosen move.
+    """
+    rng = np.random.default_rng(seed)
+    states = []
+    for _ in range(positions):
+        minimax.set_board(np.zeros((minimax.BOARD_SIZE,) * 3, dtype=np.int32))
+        minimax.random_opening(plies, rng)
+        states.append(minimax.board.copy())
+    try:
+        for number in levels:
+            minimax.set_level(number, seed)
+            cpu_ms, nodes, depths = [], [], []
+            digest = hashlib.sha1()
+            for state in states:
+                minimax.set_board(state)
+                infos = []
+                start_nodes = minimax.nodes_searched
+                start = time.process_time()
+                move = minimax.engine_move_for(minimax.AI, infos.append)
+                elapsed = time.process_time() - start
+                digest.update(repr(tuple(int(v) for v in move)).encode())
+                if infos:
+                    cpu_ms.append(elapsed * 1000)
+                    nodes.append(minimax.nodes_searched - start_nodes)
+                    depths.append(infos[-1]["depth"] - (not infos[-1]["complete"]))  # Completed depth
+            yield number, cpu_ms, nodes, depths, digest.hexdigest()[:12]
+    finally:
+        minimax.set_level(None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure minimax nodes/sec across board sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 6, 7])
+    parser.add_argument("--win-length", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--positions", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--levels", type=int, nargs="*", default=None,
+                        help="report CPU-ms per ai_move at these strength levels (all when none are given)")
+    parser.add_argument("--plies", type=int, default=4, help="random moves leading to each --levels position")
+    args = parser.parse_args()
+
+    if args.levels is not None:
+        # Compile the search and ai_move's shortcut kernels first
+        bench_size(args.sizes[0], args.win_length, 2, 1, args.seed)
+        list(bench_levels([min(minimax.LEVELS)], 1, args.plies, args.seed))
+        # Averages cover searched moves only; the digest of all chosen moves should match on every machine
+        print(f"{'level':>5} {'searched':>8} {'nodes':>8} {'depth':>6} {'cpu-ms':>8} {'p90':>8} {'max':>8} {'moves':>13}")
+        for number, cpu_ms, nodes, depths, digest in bench_levels(args.levels or sorted(minimax.LEVELS),
+                                                                  args.positions, args.plies, args.seed):
+            if not cpu_ms:
+                print(f"{number:>5} {0:>8} {'-':>8} {'-':>6} {'-':>8} {'-':>8} {'-':>8} {digest:>13}")
+                continue
+            print(f"{number:>5} {len(cpu_ms):>8} {np.mean(nodes):>8.0f} {np.mean(depths):>6.2f} {np.mean(cpu_ms):>8.1f} "
+                  f"{np.percentile(cpu_ms, 90):>8.1f} {max(cpu_ms):>8.1f} {digest:>13}")
+        return
+
+    # Compile the kernels before timing anything
+    bench_size(args.sizes[0], args.win_length, 1, 1, args.seed)
+
+    print(f"{'size':>6} {'lines':>7} {'nodes':>10} {'sec':>8} {'nodes/sec':>11}")
+    for size in args.sizes:
+        nodes, elapsed = bench_size(size, args.win_length, args.depth, args.positions, args.seed)
+        print(f"{size:>4}^3 {len(minimax.lines):>7} {nodes:>10} {elapsed:>8.3f} {nodes / elapsed:>11.0f}")
+
+if __name__ == "__main__":
+    main()
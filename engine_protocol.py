@@ -0,0 +1,283 @@
+import sys
+import threading
+import numpy as np
+import minimax
+
+# A line-oriented protocol modelled on UCI, for tournament managers, test harnesses and
+# services that keep one warm engine process. Moves are "x,y" columns (1-based) or
+# "x,y,z" cells; the engine always answers with "x,y,z". The first mover is PLAYER.
+#
+#   uci                                   -> id, option lines, uciok
+#   isready                               -> readyok, at once even while searching (compiles the kernels the first time)
+#   ucinewgame                            -> clears the transposition table
+#   setoption name <name> value <value>
+#   position startpos [moves <m> ...]
+#   go [depth N] [nodes N] [movetime MS] [wtime MS] [btime MS] [winc MS] [binc MS] [movestogo N] [infinite]
+#                                         -> info lines per completed depth, then bestmove
+#                                            (with the Level option set, a go without depth, nodes, movetime or
+#                                            infinite searches the level's node budget and ignores the clock)
+#   stop                                  -> ends the search now; bestmove from the last completed depth
+#   d                                     -> prints the board
+#   quit
+NAME = "3D Connect-4"
+DEFAULT_MOVES_TO_GO = 20  # Moves the remaining clock time is spread over when movestogo is not given
+TIME_MARGIN = 0.05  # Seconds of the remaining clock never spent, for process and pipe overhead
+MIN_MOVE_TIME = 0.1  # Clock-based searches get at least this long, clock permitting, so depth 1 can finish
+
+def parse_move(token):
+    """Turns "x,y" or "x,y,z" into a legal (x, y, z) on the current board, or None"""
+    try:
+        coords = tuple(int(v) for v in token.split(","))
+    except ValueError:
+        return None
+    if len(coords) == 2 and 1 <= coords[0] <= minimax.BOARD_SIZE and 1 <= coords[1] <= minimax.BOARD_SIZE:
+        coords += (int(np.count_nonzero(minimax.board[coords[0] - 1, coords[1] - 1])) + 1,)
+    if len(coords) != 3 or not minimax.valid_move(*coords):
+        return None
+    return coords
+
+def set_level(value):
+    """Level option setter: 0 turns levels off; the table is cleared since noisy scores must not outlive the level"""
+    minimax.set_level(int(value) or None)
+    minimax.transposition_table.clear()
+
+def fallback_move(side):
+    """Move for side when not even depth 1 finished: an immediate win, else a block, else the lowest drop"""
+    moves = minimax.get_valid_moves()
+    for player in (side, -side):
+        for move in moves:
+            minimax.make_move(*move, player)
+            won = minimax.check_win(player, move)
+            minimax.undo_move(*move)
+            if won:
+                return move
+    return min(moves, key=lambda m: m[2])
+
+def format_move(move):
+    return ",".join(str(int(v)) for v in move)
+
+def format_score(line, side):
+    """UCI-style score for side to move: "cp N", or "mate N" in moves (negative when side loses)"""
+    score = int(line["score"])
+    if abs(score) < 100000:
+        return f"cp {score}"
+    winner = side if score > 0 else -side
+    plies = int(line["moves_to_win"]) + (2 if winner == minimax.PLAYER else 1)
+    moves = max((plies + 1) // 2, 1)
+    return f"mate {moves if winner == side else -moves}"
+
+class EngineProtocol:
+    """Reads commands with handle() and writes replies to out; searches run on a background thread"""
+
+    OPTIONS = {
+        # name: (type, default, setter); None for options cmd_setoption handles itself
+        "BoardSize": ("spin", minimax.BOARD_SIZE, None),
+        "WinLength": ("spin", minimax.WIN_LENGTH, None),
+        "MultiPV": ("spin", 1, None),
+        "MoveTime": ("spin", int(minimax.TIME_LIMIT * 1000), lambda v: setattr(minimax, "TIME_LIMIT", int(v) / 1000)),
+        "Quiescence": ("spin", minimax.QUIESCENCE_PLIES, lambda v: setattr(minimax, "QUIESCENCE_PLIES", int(v))),
+        "NullMove": ("check", minimax.USE_NULL_MOVE, lambda v: setattr(minimax, "USE_NULL_MOVE", v == "true")),
+        "LMR": ("check", minimax.USE_LMR, lambda v: setattr(minimax, "USE_LMR", v == "true")),
+        "Level": ("spin", 0, set_level),
+    }
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.out_lock = threading.Lock()
+        self.search_thread = None
+        self.multipv = 1
+        self.side = minimax.PLAYER  # Side to move
+        self.game_over = False
+        self.warm = False
+
+    def send(self, line):
+        with self.out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def handle(self, line):
+        """Runs one command line; returns False after quit"""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "quit":
+            self.stop()
+            return False
+        handler = getattr(self, "cmd_" + command, None)
+        if handler is None:
+            self.send(f"info string unknown command {command}")
+        else:
+            handler(args)
+        return True
+
+    def cmd_uci(self, args):
+        self.send(f"id name {NAME}")
+        for name, (kind, default, _) in self.OPTIONS.items():
+            if kind == "check":
+                self.send(f"option name {name} type check default {str(default).lower()}")
+            else:
+                self.send(f"option name {name} type spin default {default}")
+        self.send("uciok")
+
+    def cmd_isready(self, args):
+        # Answered at once, even mid-search; a running search compiles the kernels itself
+        if not self.warm and not self.searching():
+            self.wait()
+            # Compile the kernels now rather than during the first timed search
+            board = minimax.board.copy()
+            minimax.set_board(np.zeros_like(board))
+            for _ in minimax.search_iter(1, 2, 1e9):
+                pass
+            minimax.set_board(board)
+            minimax.transposition_table.clear()
+            self.warm = True
+        self.send("readyok")
+
+    def cmd_ucinewgame(self, args):
+        self.wait()
+        minimax.transposition_table.clear()
+
+    def cmd_setoption(self, args):
+        self.wait()
+        if "name" not in args:
+            return
+        value_at = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:value_at])
+        value = " ".join(args[value_at + 1:])
+        option = next((key for key in self.OPTIONS if key.lower() == name.lower()), None)
+        if option is None:
+            self.send(f"info string unknown option {name}")
+            return
+        try:
+            if option == "MultiPV":
+                self.multipv = max(1, int(value))
+            elif option == "BoardSize":
+                self.configure(int(value), minimax.WIN_LENGTH)
+            elif option == "WinLength":
+                self.configure(minimax.BOARD_SIZE, int(value))
+            else:
+                self.OPTIONS[option][2](value)
+        except ValueError as e:
+            self.send(f"info string bad value for {option}: {e}")
+
+    def configure(self, size, win_length):
+        """Changes the board geometry, which empties the board, so the game restarts as after position startpos"""
+        minimax.configure(size, win_length)
+        self.side = minimax.PLAYER
+        self.game_over = False
+
+    def cmd_position(self, args):
+        self.wait()
+        if not args or args[0] != "startpos":
+            self.send("info string only 'position startpos [moves ...]' is supported")
+            return
+        size = minimax.BOARD_SIZE
+        minimax.set_board(np.zeros((size, size, size), dtype=np.int32))
+        self.side = minimax.PLAYER
+        self.game_over = False
+        for token in args[2:] if len(args) > 1 and args[1] == "moves" else []:
+            move = parse_move(token)
+            if move is None or self.game_over:
+                self.send(f"info string illegal move {token}")
+                return
+            minimax.make_move(*move, self.side)
+            self.game_over = minimax.check_win(self.side, move) or minimax.board_full()
+            self.side = -self.side
+
+    def cmd_go(self, args):
+        self.wait()
+        limits = {}
+        infinite = "infinite" in args
+        for i, token in enumerate(args[:-1]):
+            if token in ("depth", "nodes", "movetime", "wtime", "btime", "winc", "binc", "movestogo"):
+                try:
+                    limits[token] = int(args[i + 1])
+                except ValueError:
+                    pass
+        if self.game_over or not minimax.get_valid_moves():
+            self.send("bestmove (none)")
+            return
+        max_nodes = limits.get("nodes")
+        time_limit = None
+        if minimax.level is not None and not infinite and not {"depth", "nodes", "movetime"} & limits.keys():
+            # The level's node budget alone decides, so the reply does not depend on the clock or earlier searches
+            limits["depth"] = minimax.level["depth"] or minimax.BOARD_SIZE ** 3
+            max_nodes = minimax.level_budget()
+            time_limit = float("inf")
+            minimax.transposition_table.clear()
+        elif infinite or (("depth" in limits or "nodes" in limits) and "movetime" not in limits):
+            time_limit = float("inf")
+        elif "movetime" in limits:
+            time_limit = limits["movetime"] / 1000
+        else:
+            clock, inc = ("wtime", "winc") if self.side == minimax.PLAYER else ("btime", "binc")
+            if clock in limits:
+                # The margin comes off the whole clock once, not off every move's share
+                available = limits[clock] / 1000 - TIME_MARGIN
+                if available <= 0:
+                    # No time to search at all: answer from the tactical fallback straight away
+                    self.send(f"bestmove {format_move(fallback_move(self.side))}")
+                    return
+                share = available / limits.get("movestogo", DEFAULT_MOVES_TO_GO) + limits.get(inc, 0) / 1000
+                # The floor gives depth 1 a chance, but never more than the clock has left
+                time_limit = min(max(share, MIN_MOVE_TIME), available)
+        max_depth = limits.get("depth", minimax.BOARD_SIZE ** 3 if infinite or time_limit is not None else None)
+        minimax.stop_search.clear()
+        self.search_thread = threading.Thread(
+            target=self.search, args=(max_depth, time_limit, max_nodes), daemon=True)
+        self.search_thread.start()
+
+    def search(self, max_depth, time_limit, max_nodes):
+        """Search thread: reports every completed depth, then the best move"""
+        best = None
+        for info in minimax.search_iter(self.multipv, max_depth, time_limit, self.side, max_nodes):
+            best = info["move"]
+            elapsed_ms = max(int(info["elapsed"] * 1000), 1)
+            for i, line in enumerate(info["lines"], start=1):
+                multipv = f" multipv {i}" if self.multipv > 1 else ""
+                self.send(f"info depth {info['depth']}{multipv} score {format_score(line, self.side)} "
+                          f"nodes {info['nodes']} nps {info['nodes'] * 1000 // elapsed_ms} time {elapsed_ms} "
+                          f"pv {' '.join(format_move(m) for m in line['pv'])}")
+        if best is None:
+            best = fallback_move(self.side)
+        self.send(f"bestmove {format_move(best)}")
+
+    def cmd_stop(self, args):
+        self.stop()
+
+    def cmd_d(self, args):
+        self.wait()
+        for z in range(minimax.BOARD_SIZE - 1, -1, -1):
+            # X is PLAYER (1), O is AI (-1)
+            rows = [" ".join(".XO"[int(minimax.board[x, y, z])] for x in range(minimax.BOARD_SIZE))
+                    for y in range(minimax.BOARD_SIZE)]
+            self.send(f"info string z={z + 1}: " + " | ".join(rows))
+        self.send(f"info string {'X' if self.side == minimax.PLAYER else 'O'} to move")
+
+    def stop(self):
+        """Ends a running search; it still reports its best move"""
+        if self.search_thread is not None:
+            minimax.stop_search.set()
+        self.wait()
+
+    def searching(self):
+        return self.search_thread is not None and self.search_thread.is_alive()
+
+    def wait(self):
+        """Blocks until the running search, if any, has sent its bestmove"""
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+            # Leave no stop request behind for the next search_iter call, such as isready's warm-up
+            minimax.stop_search.clear()
+
+def main():
+    protocol = EngineProtocol()
+    for line in sys.stdin:
+        if not protocol.handle(line):
+            break
+    protocol.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import minimax
+from game_records import GameRecordFile
+from shared_tt import SharedTranspositionTable, use_shared_table
+
+DEFAULT_TIME_BUDGET = 1.0  # Seconds of engine time per AI move unless the request asks for less
+MAX_TIME_BUDGET = 5.0
+RESULT_GRACE = 2.0  # Extra seconds to wait for a worker past the budget before giving up
+MIN_SEARCH_TIME = 0.05  # Seconds a worker searches even if the move's deadline passed while it was queued
+LEVEL_TIMEOUT = 30.0  # Seconds a move at a strength level, whose cost is set by nodes, may take once a worker has it
+LATENCY_WINDOW = 1000  # Recent engine calls kept for percentiles
+
+def _init_worker(shared_tt=None):
+    """Silences engine output, attaches the shared transposition table and compiles the kernels once per worker process"""
+    sys.stdout = open(os.devnull, 'w')
+    if shared_tt:
+        use_shared_table(shared_tt)
+    minimax.TIME_LIMIT = 0.05
+    minimax.make_move(1, 1, 1, minimax.PLAYER)
+    minimax.ai_move()
+
+def _ready():
+    return True
+
+def _engine_move(state, deadline, level=None, seed=0):
+    """Runs ai_move on state inside a worker process, searching until deadline (a time.time()) or at a strength level"""
+    minimax.set_board(np.array(state, dtype=np.int32))
+    minimax.TIME_LIMIT = max(deadline - time.time(), MIN_SEARCH_TIME)
+    minimax.set_level(level, seed)
+    return minimax.ai_move()
+
+class Game:
+    def __init__(self, game_id, level=None, seed=0):
+        self.id = game_id
+        self.level = level  # minimax.LEVELS key, or None to search by time budget
+        self.seed = seed
+        self.board = np.zeros((minimax.BOARD_SIZE,) * 3, dtype=np.int32)
+        self.moves = []
+        self.first = None
+        self.status = "playing"  # playing, player_won, ai_won, draw
+        self.lock = threading.Lock()
+
+    def play(self, x, y, z, player):
+        """Applies a move and updates the status"""
+        self.board[x - 1, y - 1, z - 1] = player
+        if not self.moves:
+            self.first = player
+        self.moves.append((x, y, z))
+        if minimax.check_win_numba(self.board, player, minimax.directions, minimax.WIN_LENGTH,
+                                   np.array((x, y, z), dtype=np.int32)):
+            self.status = "player_won" if player == minimax.PLAYER else "ai_won"
+        elif not np.any(self.board == 0):
+            self.status = "draw"
+
+    def drop_height(self, x, y):
+        """Returns the z where a piece dropped in column (x, y) lands, or None if it is full"""
+        if not (1 <= x <= minimax.BOARD_SIZE and 1 <= y <= minimax.BOARD_SIZE):
+            return None
+        z = int(np.count_nonzero(self.board[x - 1, y - 1])) + 1
+        return z if z <= minimax.BOARD_SIZE else None
+
+    def to_dict(self):
+        return {"id": self.id, "status": self.status, "level": self.level, "moves": self.moves,
+                "board": self.board.tolist()}
+
+class EngineService:
+    """Hosts games by id and sends AI moves to a bounded pool of engine processes"""
+
+    def __init__(self, workers=None, max_pending=None, record_path=None, shared_tt_slots=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        # With a shared table, a worker picking up a game's next move can reuse whichever worker searched the last one
+        self.shared_tt = SharedTranspositionTable(slots=shared_tt_slots) if shared_tt_slots else None
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.shared_tt.name if self.shared_tt else None,))
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.games = {}
+        self.games_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.records = GameRecordFile(record_path) if record_path else None
+        self.records_lock = threading.Lock()
+        # Start and warm every worker now so the first games do not pay for JIT compilation
+        for future in [self.pool.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def new_game(self, level=None, seed=0):
+        """Creates a game; raises ValueError for an unknown level"""
+        if level is not None and level not in minimax.LEVELS:
+            raise ValueError(f"unknown level {level}; choose from {sorted(minimax.LEVELS)}")
+        game = Game(uuid.uuid4().hex[:12], level, seed)
+        with self.games_lock:
+            self.games[game.id] = game
+        return game
+
+    def get_game(self, game_id):
+        with self.games_lock:
+            return self.games.get(game_id)
+
+    def delete_game(self, game_id):
+        with self.games_lock:
+            return self.games.pop(game_id, None) is not None
+
+    def record(self, game):
+        """Appends a finished game to the record file, if one is configured"""
+        if self.records is None or game.status == "playing":
+            return
+        result = {"player_won": minimax.PLAYER, "ai_won": minimax.AI}.get(game.status, 0)
+        with self.records_lock:
+            self.records.append(game.moves, result, game.first)
+
+    def request_ai_move(self, game, time_budget):
+        """Gets an AI move for game from the pool. Raises OverflowError when the queue is full.
+
+        time_budget covers the whole request, time queued included: the worker
+        only searches for what is left of it when it picks the move up.
+        """
+        if not self.slots.acquire(blocking=False):
+            with self.stats_lock:
+                self.rejected += 1
+            raise OverflowError("engine queue is full")
+        start = time.perf_counter()
+        deadline = time.time() + time_budget
+        with self.stats_lock:
+            ahead = self.in_flight
+            self.in_flight += 1
+        try:
+            future = self.pool.submit(_engine_move, game.board.tolist(), deadline, game.level, game.seed)
+        except Exception:
+            self.release_slot(None)
+            raise
+        # The slot is held until the worker is really done, even if this request gives up first
+        future.add_done_callback(self.release_slot)
+        try:
+            if game.level:
+                # Nothing cuts a level move short, and it starts only once the moves ahead of it have
+                # been through the workers, so allow LEVEL_TIMEOUT for every round of them
+                timeout = LEVEL_TIMEOUT * (ahead // self.workers + 1)
+            else:
+                timeout = time_budget + RESULT_GRACE
+            move = future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self.stats_lock:
+                self.timed_out += 1
+                self.latencies.append(time.perf_counter() - start)
+            raise
+        with self.stats_lock:
+            self.completed += 1
+            self.latencies.append(time.perf_counter() - start)
+        return tuple(int(v) for v in move)
+
+    def release_slot(self, future):
+        with self.stats_lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    def stats(self):
+        with self.stats_lock:
+            latencies = np.array(self.latencies)
+            result = {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+        with self.games_lock:
+            result["games"] = len(self.games)
+        for p in (50, 90, 99):
+            result[f"latency_p{p}_ms"] = round(float(np.percentile(latencies, p)) * 1000, 1) if len(latencies) else None
+        return result
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+        if self.shared_tt:
+            self.shared_tt.close()
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """JSON API:
+
+    POST   /games               {"ai_first": bool, "time_budget": float, "level": int, "seed": int} -> game
+    GET    /games/<id>                                                                              -> game
+    POST   /games/<id>/move     {"x": int, "y": int, "time_budget": float}                          -> game + ai_move
+    DELETE /games/<id>
+    GET    /stats                                                                                   -> queue depth, latency percentiles
+
+    A game with a level (see minimax.LEVELS) is searched by node budget and ignores time_budget.
+    """
+    service = None  # Set by serve()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def time_budget(self, body):
+        """The request's time_budget clamped to the allowed range; raises ValueError unless it is a finite number"""
+        try:
+            budget = float(body.get("time_budget", DEFAULT_TIME_BUDGET))
+        except (TypeError, ValueError):
+            raise ValueError("time_budget must be a number") from None
+        if not math.isfinite(budget):
+            raise ValueError("time_budget must be a number")
+        return min(max(budget, 0.01), MAX_TIME_BUDGET)
+
+    def ai_reply(self, game, budget):
+        """Plays the AI move for game, sending an error response and returning None if it fails"""
+        try:
+            move = self.service.request_ai_move(game, budget)
+        except OverflowError as e:
+            self.send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+            return None
+        except FutureTimeout:
+            self.send_json(504, {"error": "engine did not answer within the time budget"})
+            return None
+        game.play(*move, minimax.AI)
+        return move
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts == ["stats"]:
+            self.send_json(200, self.service.stats())
+        elif len(parts) == 2 and parts[0] == "games":
+            game = self.service.get_game(parts[1])
+            if game is None:
+                self.send_json(404, {"error": "no such game"})
+                return
+            with game.lock:
+                self.send_json(200, game.to_dict())
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        try:
+            body = self.read_json()
+        except ValueError:
+            self.send_json(400, {"error": "invalid JSON"})
+            return
+        if not isinstance(body, dict):
+            self.send_json(400, {"error": "request body must be a JSON object"})
+            return
+        # Validate everything before touching a game, so a bad request never leaves half a turn behind
+        try:
+            budget = self.time_budget(body)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        if parts == ["games"]:
+            try:
+                level = None if body.get("level") is None else int(body["level"])
+                game = self.service.new_game(level, int(body.get("seed", 0)))
+            except (TypeError, ValueError) as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            with game.lock:
+                if body.get("ai_first") and self.ai_reply(game, budget) is None:
+                    self.service.delete_game(game.id)
+                    return
+                self.send_json(201, game.to_dict())
+        elif len(parts) == 3 and parts[0] == "games" and parts[2] == "move":
+            game = self.service.get_game(parts[1])
+            if game is None:
+                self.send_json(404, {"error": "no such game"})
+                return
+            with game.lock:
+                if game.status != "playing":
+                    self.send_json(409, {"error": "game is over", **game.to_dict()})
+                    return
+                try:
+                    x, y = int(body["x"]), int(body["y"])
+                except (KeyError, TypeError, ValueError):
+                    self.send_json(400, {"error": "x and y are required"})
+                    return
+                z = game.drop_height(x, y)
+                if z is None:
+                    self.send_json(400, {"error": "invalid move"})
+                    return
+                game.play(x, y, z, minimax.PLAYER)
+                ai_move = None
+                if game.status == "playing":
+                    ai_move = self.ai_reply(game, budget)
+                    if ai_move is None:
+                        # Take the player's move back so the client can retry
+                        game.board[x - 1, y - 1, z - 1] = 0
+                        game.moves.pop()
+                        return
+                self.service.record(game)
+                self.send_json(200, {**game.to_dict(), "player_move": (x, y, z), "ai_move": ai_move})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "games" and self.service.delete_game(parts[1]):
+            self.send_json(200, {"deleted": parts[1]})
+        else:
+            self.send_json(404, {"error": "no such game"})
+
+def serve(host="127.0.0.1", port=8765, workers=None, max_pending=None, record_path=None, shared_tt_slots=None):
+    service = EngineService(workers, max_pending, record_path, shared_tt_slots)
+    RequestHandler.service = service
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    print(f"Engine service on http://{host}:{port} with {service.workers} workers, queue limit {service.max_pending}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP service hosting many 3D Connect-4 games")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="engine processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=None, help="queued + running moves before 503 (default: 4 per worker)")
+    parser.add_argument("--record", default=None, help="append finished games to this .c4r file")
+    parser.add_argument("--shared-tt", type=int, default=0, metavar="MB",
+                        help="share a transposition table of this many MB between workers (default: one per worker)")
+    args = parser.parse_args()
+    slots = 1 << ((args.shared_tt << 20) // 16).bit_length() - 1 if args.shared_tt > 0 else None
+    serve(args.host, args.port, args.workers, args.max_pending, args.record, slots)
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import threading
 import time
 import importlib
 import numpy as np
+from game_records import GameRecordFile
 
 # Initialize Pygame
 pygame.init()
@@ -18,6 +19,11 @@ CELL_SIZE = BOARD_SIZE // 5
 MARGIN = (WINDOW_SIZE[0] - BOARD_SIZE) // 2
 TOP_MARGIN = 100
 LAYER_BUTTON_SIZE = 40
+ACTIVE_FPS = 60
+IDLE_FPS = 5        # Tick rate when there is no input, AI search or message on screen
+IDLE_AFTER = 2.0    # Seconds without input before switching to idle tick rate
+ERROR_DURATION = 1.0  # Seconds an error message stays on screen
+HINT_TIME = 1.0  # Seconds of analysis for a move hint
 
 # Colors
 BLACK = (0, 0, 0)
@@ -36,6 +42,8 @@ BACKGROUND_COLOR = (20, 20, 40)  # Dark blue background
 BUTTON_COLOR = (40, 40, 80)      # Darker blue for buttons
 BUTTON_HOVER = (60, 60, 100)     # Lighter blue for button hover
 
+GAME_LOG = 'games.c4r'  # Binary record of every finished game
+
 # Game states
 MENU = 0
 GAME = 1
@@ -73,12 +81,23 @@ class GameInterface:
         self.game_over = False
         self.message = None
         self.error_message = None
-        self.error_timer = 0
+        self.error_until = 0
         self.ai_thinking = False
+        self.hint = None  # Suggested move for the player, from analyze
+        self.search_info = None  # Latest completed iteration of the AI's search
+        self.hint_thread = None
         self.last_player_move = None
         self.last_ai_move = None
+        self.move_history = []  # Moves of the current game, for the game log
+        self.first_mover = None
         self.ai_move_thread = None
         self.ai_move_result = None
+        self.text_cache = {}  # (text, font, color) -> rendered surface
+        self.region_keys = {}  # Region name -> key it was last drawn with
+        self.dirty_rects = []
+        self.full_redraw = True
+        self.drawn_state = None
+        self.last_input = time.time()
         self.main_module = None
         self.load_main_module()
         self.winning_combination = None
@@ -98,39 +117,76 @@ class GameInterface:
     def save_scores(self):
         with open('scores.json', 'w') as f:
             json.dump(self.scores, f)
+
+    def record_move(self, move, player):
+        if not self.move_history:
+            self.first_mover = player
+        self.move_history.append(move)
+
+    def record_game(self, result):
+        try:
+            GameRecordFile(GAME_LOG).append(self.move_history, result, self.first_mover)
+        except (OSError, ValueError) as e:
+            print(f"Error saving game record: {e}")
     
+    def render_text(self, text, font=None, color=WHITE):
+        """Returns a cached text surface, rendering it only the first time"""
+        font = font or self.font
+        key = (text, id(font), color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.text_cache[key] = surface
+        return surface
+
+    def invalidate(self):
+        """Forces a full-window redraw on the next frame"""
+        self.region_keys.clear()
+        self.full_redraw = True
+
+    def draw_region(self, name, rect, key, draw):
+        """Redraws a screen region only when its key changed and marks it dirty"""
+        if name in self.region_keys and self.region_keys[name] == key:
+            return
+        self.region_keys[name] = key
+        rect = pygame.Rect(rect)
+        self.screen.fill(BACKGROUND_COLOR, rect)
+        draw()
+        self.dirty_rects.append(rect)
+
+    def draw_button(self, rect, text, hovered):
+        pygame.draw.rect(self.screen, BUTTON_HOVER if hovered else BUTTON_COLOR, rect)
+        pygame.draw.rect(self.screen, WHITE, rect, 2)  # White border
+        self.screen.blit(text, (WINDOW_SIZE[0]//2 - text.get_width()//2, rect[1] + rect[3]//2 - text.get_height()//2))
+
+    def draw_centered(self, text, y):
+        self.screen.blit(text, (WINDOW_SIZE[0]//2 - text.get_width()//2, y))
+
     def draw_menu(self):
-        self.screen.fill(BACKGROUND_COLOR)
-        title = self.font.render("3D Connect-4", True, WHITE)
-        start = self.font.render("Start Game", True, WHITE)
-        rules = self.font.render("Rules", True, WHITE)
-        scores = self.font.render("Scores", True, WHITE)
-        quit_text = self.font.render("Quit", True, WHITE)
-        
+        title = self.render_text("3D Connect-4")
+        self.draw_region("title", (0, 100, WINDOW_SIZE[0], title.get_height()), None,
+                         lambda: self.draw_centered(title, 100))
+
         # Draw buttons with hover effect
         buttons = [
-            (300, 200, 200, 50, start, "start"),
-            (300, 270, 200, 50, rules, "rules"),
-            (300, 340, 200, 50, scores, "scores"),
-            (300, 410, 200, 50, quit_text, "quit")
+            (300, 200, 200, 50, "Start Game", "start"),
+            (300, 270, 200, 50, "Rules", "rules"),
+            (300, 340, 200, 50, "Scores", "scores"),
+            (300, 410, 200, 50, "Quit", "quit")
         ]
         
         mouse_pos = pygame.mouse.get_pos()
         self.button_hover = None
         
-        for x, y, w, h, text, name in buttons:
-            color = BUTTON_HOVER if (x <= mouse_pos[0] <= x + w and y <= mouse_pos[1] <= y + h) else BUTTON_COLOR
-            pygame.draw.rect(self.screen, color, (x, y, w, h))
-            pygame.draw.rect(self.screen, WHITE, (x, y, w, h), 2)  # White border
-            self.screen.blit(text, (WINDOW_SIZE[0]//2 - text.get_width()//2, y + h//2 - text.get_height()//2))
-            if (x <= mouse_pos[0] <= x + w and y <= mouse_pos[1] <= y + h):
+        for x, y, w, h, label, name in buttons:
+            hovered = x <= mouse_pos[0] <= x + w and y <= mouse_pos[1] <= y + h
+            if hovered:
                 self.button_hover = name
-        
-        self.screen.blit(title, (WINDOW_SIZE[0]//2 - title.get_width()//2, 100))
+            text = self.render_text(label)
+            self.draw_region(name, (x, y, w, h), hovered, lambda: self.draw_button((x, y, w, h), text, hovered))
     
     def draw_rules(self):
-        self.screen.fill(BACKGROUND_COLOR)
-        title = self.font.render("Game Rules", True, WHITE)
+        title = self.render_text("Game Rules")
         rules = [
             "1. The game is played on a 5x5x5 board",
             "2. Players take turns placing pieces",
@@ -141,34 +197,38 @@ class GameInterface:
             "Controls:",
             "- Click to place a piece",
             "- Use layer buttons on the right to switch layers",
+            "- Press H for a move hint",
             "Press ESC to return to menu"
         ]
-        
-        self.screen.blit(title, (WINDOW_SIZE[0]//2 - title.get_width()//2, 50))
-        for i, rule in enumerate(rules):
-            text = self.small_font.render(rule, True, WHITE)
-            self.screen.blit(text, (50, 120 + i * 30))
+
+        def draw():
+            self.draw_centered(title, 50)
+            for i, rule in enumerate(rules):
+                self.screen.blit(self.render_text(rule, self.small_font), (50, 120 + i * 30))
+
+        self.draw_region("rules", self.screen.get_rect(), None, draw)
     
     def draw_scores(self):
-        self.screen.fill(BACKGROUND_COLOR)
-        title = self.font.render("Scores", True, WHITE)
-        player_score = self.font.render(f"Player: {self.scores['player']}", True, WHITE)
-        ai_score = self.font.render(f"AI: {self.scores['ai']}", True, WHITE)
-        back = self.font.render("Press ESC to return to menu", True, WHITE)
-        
-        self.screen.blit(title, (WINDOW_SIZE[0]//2 - title.get_width()//2, 100))
-        self.screen.blit(player_score, (WINDOW_SIZE[0]//2 - player_score.get_width()//2, 200))
-        self.screen.blit(ai_score, (WINDOW_SIZE[0]//2 - ai_score.get_width()//2, 250))
-        self.screen.blit(back, (WINDOW_SIZE[0]//2 - back.get_width()//2, 400))
+        title = self.render_text("Scores")
+        player_score = self.render_text(f"Player: {self.scores['player']}")
+        ai_score = self.render_text(f"AI: {self.scores['ai']}")
+        back = self.render_text("Press ESC to return to menu")
+
+        def draw():
+            self.draw_centered(title, 100)
+            self.draw_centered(player_score, 200)
+            self.draw_centered(ai_score, 250)
+            self.draw_centered(back, 400)
+
+        self.draw_region("scores", self.screen.get_rect(), (self.scores['player'], self.scores['ai']), draw)
 
     def draw_select_first(self):
-        self.screen.fill(BACKGROUND_COLOR)
-        title = self.font.render("Select First Player", True, WHITE)
+        title = self.render_text("Select First Player")
 
         # Render first player selection with arrows
-        left_arrow = self.font.render(">", True, WHITE)
-        right_arrow = self.font.render("<", True, WHITE)
-        first_label = self.font.render("Player First" if self.player_turn else "AI First", True, WHITE)
+        left_arrow = self.render_text(">")
+        right_arrow = self.render_text("<")
+        first_label = self.render_text("Player First" if self.player_turn else "AI First")
 
         # Position for label and arrows
         center_x = WINDOW_SIZE[0] // 2
@@ -183,33 +243,44 @@ class GameInterface:
         label_x = center_x - label_width // 2
         right_x = center_x + label_width // 2 + spacing - right_arrow.get_width()
 
-        # Draw left arrow (button)
+        mouse_pos = pygame.mouse.get_pos()
         left_rect = pygame.Rect(left_x, arrow_y, left_arrow.get_width(), left_arrow.get_height())
-        left_color = BUTTON_HOVER if left_rect.collidepoint(pygame.mouse.get_pos()) else BUTTON_COLOR
-        pygame.draw.rect(self.screen, left_color, left_rect)
-        self.screen.blit(left_arrow, (left_x, arrow_y))
+        right_rect = pygame.Rect(right_x, arrow_y, right_arrow.get_width(), right_arrow.get_height())
+        left_hover = left_rect.collidepoint(mouse_pos)
+        right_hover = right_rect.collidepoint(mouse_pos)
 
-        # Draw label (not a button)
-        self.screen.blit(first_label, (label_x, label_y))
+        def draw_selector():
+            # Draw left arrow (button)
+            pygame.draw.rect(self.screen, BUTTON_HOVER if left_hover else BUTTON_COLOR, left_rect)
+            self.screen.blit(left_arrow, (left_x, arrow_y))
 
-        # Draw right arrow (button)
-        right_rect = pygame.Rect(right_x, arrow_y, right_arrow.get_width(), right_arrow.get_height())
-        right_color = BUTTON_HOVER if right_rect.collidepoint(pygame.mouse.get_pos()) else BUTTON_COLOR
-        pygame.draw.rect(self.screen, right_color, right_rect)
-        self.screen.blit(right_arrow, (right_x, arrow_y))
+            # Draw label (not a button)
+            self.screen.blit(first_label, (label_x, label_y))
+
+            # Draw right arrow (button)
+            pygame.draw.rect(self.screen, BUTTON_HOVER if right_hover else BUTTON_COLOR, right_rect)
+            self.screen.blit(right_arrow, (right_x, arrow_y))
+
+        self.draw_region("selector", (0, label_y, WINDOW_SIZE[0], first_label.get_height()),
+                         (self.player_turn, left_hover, right_hover), draw_selector)
 
         # Start button (without border)
-        start_button = self.font.render("Start", True, WHITE)
+        start_button = self.render_text("Start")
         start_rect = pygame.Rect(
             WINDOW_SIZE[0] // 2 - start_button.get_width() // 2, 400,
             start_button.get_width(), start_button.get_height()
         )
-        start_color = BUTTON_HOVER if start_rect.collidepoint(pygame.mouse.get_pos()) else BUTTON_COLOR
-        pygame.draw.rect(self.screen, start_color, start_rect)
-        self.screen.blit(start_button, (WINDOW_SIZE[0] // 2 - start_button.get_width() // 2, 400))
+        start_hover = start_rect.collidepoint(mouse_pos)
+
+        def draw_start():
+            pygame.draw.rect(self.screen, BUTTON_HOVER if start_hover else BUTTON_COLOR, start_rect)
+            self.screen.blit(start_button, start_rect.topleft)
+
+        self.draw_region("start", start_rect, start_hover, draw_start)
 
         # Draw title
-        self.screen.blit(title, (WINDOW_SIZE[0] // 2 - title.get_width() // 2, 200))
+        self.draw_region("title", (0, 200, WINDOW_SIZE[0], title.get_height()), None,
+                         lambda: self.draw_centered(title, 200))
 
         # Optionally: return rects for click handling
         return left_rect, right_rect, start_rect
@@ -235,104 +306,111 @@ class GameInterface:
                            (button_x + LAYER_BUTTON_SIZE//2, button_y + LAYER_BUTTON_SIZE * 3),
                            (button_x + LAYER_BUTTON_SIZE, button_y + LAYER_BUTTON_SIZE * 2)])
     
+    def draw_cell(self, x, y, piece, winning, last_move, hint):
+        cell_rect = pygame.Rect(MARGIN + x * CELL_SIZE, TOP_MARGIN + y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+        center = (MARGIN + x * CELL_SIZE + CELL_SIZE//2, TOP_MARGIN + y * CELL_SIZE + CELL_SIZE//2)
+
+        # If this cell is part of winning combination, highlight it
+        if winning:
+            pygame.draw.rect(self.screen, GREEN, cell_rect)
+
+        pygame.draw.rect(self.screen, WHITE, cell_rect, 2)  # White grid lines
+
+        # Draw piece
+        if piece == self.main_module.PLAYER:
+            color = VERY_LIGHT_BLUE if self.ai_thinking else LIGHT_BLUE
+            pygame.draw.circle(self.screen, color, center, CELL_SIZE//2 - 5)
+        elif piece == self.main_module.AI:
+            color = VERY_LIGHT_RED if self.ai_thinking else RED
+            pygame.draw.circle(self.screen, color, center, CELL_SIZE//2 - 5)
+
+        # Highlight last moves
+        if last_move:
+            pygame.draw.circle(self.screen, YELLOW, center, CELL_SIZE//2 - 2, 2)
+
+        # Mark the suggested move
+        if hint:
+            pygame.draw.circle(self.screen, GREEN, center, CELL_SIZE//4, 3)
+
+    def draw_layer_arrow(self, points, color):
+        pygame.draw.polygon(self.screen, color, points)
+        pygame.draw.polygon(self.screen, WHITE, points, 2)
+
     def draw_board(self):
-        self.screen.fill(BACKGROUND_COLOR)
-        
-        # Draw layer selector
-        layer_text = self.font.render(f"Layer: {self.current_layer + 1}", True, WHITE)
-        self.screen.blit(layer_text, (50, 50))
-        
-        # Draw board
+        # Draw header: layer selector, game over message and error message
+        error_visible = self.error_message is not None and time.time() < self.error_until
+        search_info = self.search_info
+        search_depth = search_info["depth"] if search_info else None
+
+        def draw_header():
+            self.screen.blit(self.render_text(f"Layer: {self.current_layer + 1}"), (50, 50))
+            if self.message:
+                self.draw_centered(self.message, 50)
+
+                # If game is over and there's a winning combination, show navigation hint
+                if self.game_over and self.winning_combination:
+                    hint = self.render_text("Use layer buttons to view winning combination", self.small_font)
+                    self.draw_centered(hint, 80)
+            elif self.hint:
+                self.draw_centered(self.render_text("Hint: {} {} {}".format(*self.hint), color=GREEN), 50)
+            if self.ai_thinking and search_depth:
+                self.draw_centered(self.render_text(f"AI thinking... depth {search_depth}", self.small_font), 80)
+            if error_visible:
+                self.draw_centered(self.error_message, 50)
+
+        self.draw_region("header", (0, 40, WINDOW_SIZE[0], TOP_MARGIN - 42),
+                         (self.current_layer, self.message, self.winning_combination is not None, self.hint,
+                          self.ai_thinking and search_depth,
+                          self.error_message if error_visible else None), draw_header)
+
+        # Draw board, redrawing only the cells whose contents changed
+        layer = self.current_layer
         for x in range(5):
             for y in range(5):
-                # Draw cell background
-                cell_rect = pygame.Rect(MARGIN + x * CELL_SIZE, 
-                                      TOP_MARGIN + y * CELL_SIZE, 
-                                      CELL_SIZE, CELL_SIZE)
-                
-                # If this cell is part of winning combination, highlight it
-                if self.winning_combination and (x+1, y+1, self.current_layer+1) in self.winning_combination:
-                    pygame.draw.rect(self.screen, GREEN, cell_rect)
-                
-                pygame.draw.rect(self.screen, WHITE, cell_rect, 2)  # White grid lines
-                
-                # Draw piece
-                if self.main_module.board[x, y, self.current_layer] == self.main_module.PLAYER:
-                    color = VERY_LIGHT_BLUE if self.ai_thinking else LIGHT_BLUE
-                    pygame.draw.circle(self.screen, color,
-                                    (MARGIN + x * CELL_SIZE + CELL_SIZE//2,
-                                     TOP_MARGIN + y * CELL_SIZE + CELL_SIZE//2),
-                                    CELL_SIZE//2 - 5)
-                elif self.main_module.board[x, y, self.current_layer] == self.main_module.AI:
-                    color = VERY_LIGHT_RED if self.ai_thinking else RED
-                    pygame.draw.circle(self.screen, color,
-                                    (MARGIN + x * CELL_SIZE + CELL_SIZE//2,
-                                     TOP_MARGIN + y * CELL_SIZE + CELL_SIZE//2),
-                                    CELL_SIZE//2 - 5)
-                
-                # Highlight last moves
-                if self.last_player_move and (x+1, y+1, self.current_layer+1) == self.last_player_move:
-                    pygame.draw.circle(self.screen, YELLOW,
-                                    (MARGIN + x * CELL_SIZE + CELL_SIZE//2,
-                                     TOP_MARGIN + y * CELL_SIZE + CELL_SIZE//2),
-                                    CELL_SIZE//2 - 2, 2)
-                if self.last_ai_move and (x+1, y+1, self.current_layer+1) == self.last_ai_move:
-                    pygame.draw.circle(self.screen, YELLOW,
-                                    (MARGIN + x * CELL_SIZE + CELL_SIZE//2,
-                                     TOP_MARGIN + y * CELL_SIZE + CELL_SIZE//2),
-                                    CELL_SIZE//2 - 2, 2)
-        
+                piece = int(self.main_module.board[x, y, layer])
+                cell = (x+1, y+1, layer+1)
+                winning = bool(self.winning_combination) and cell in self.winning_combination
+                last_move = cell == self.last_player_move or cell == self.last_ai_move
+                hint = cell == self.hint
+                self.draw_region((x, y), (MARGIN + x * CELL_SIZE, TOP_MARGIN + y * CELL_SIZE, CELL_SIZE, CELL_SIZE),
+                                 (piece, winning, last_move, hint, self.ai_thinking and piece != 0),
+                                 lambda: self.draw_cell(x, y, piece, winning, last_move, hint))
+
         # Draw layer buttons with hover effect
         button_x = WINDOW_SIZE[0] - LAYER_BUTTON_SIZE - 20
         button_y = TOP_MARGIN
         mouse_pos = pygame.mouse.get_pos()
         
         # Draw up button
-        up_color = BUTTON_HOVER if (button_x <= mouse_pos[0] <= button_x + LAYER_BUTTON_SIZE and 
-                                  button_y <= mouse_pos[1] <= button_y + LAYER_BUTTON_SIZE) else BUTTON_COLOR
-        pygame.draw.polygon(self.screen, up_color if self.current_layer < 4 else DARK_GRAY,
-                          [(button_x, button_y + LAYER_BUTTON_SIZE),
-                           (button_x + LAYER_BUTTON_SIZE//2, button_y),
-                           (button_x + LAYER_BUTTON_SIZE, button_y + LAYER_BUTTON_SIZE)])
-        pygame.draw.polygon(self.screen, WHITE,
-                          [(button_x, button_y + LAYER_BUTTON_SIZE),
-                           (button_x + LAYER_BUTTON_SIZE//2, button_y),
-                           (button_x + LAYER_BUTTON_SIZE, button_y + LAYER_BUTTON_SIZE)], 2)
+        up_hover = (button_x <= mouse_pos[0] <= button_x + LAYER_BUTTON_SIZE and
+                    button_y <= mouse_pos[1] <= button_y + LAYER_BUTTON_SIZE)
+        up_color = (BUTTON_HOVER if up_hover else BUTTON_COLOR) if self.current_layer < 4 else DARK_GRAY
+        up_points = [(button_x, button_y + LAYER_BUTTON_SIZE),
+                     (button_x + LAYER_BUTTON_SIZE//2, button_y),
+                     (button_x + LAYER_BUTTON_SIZE, button_y + LAYER_BUTTON_SIZE)]
+        self.draw_region("up", pygame.Rect(button_x, button_y, LAYER_BUTTON_SIZE, LAYER_BUTTON_SIZE).inflate(4, 4),
+                         up_color, lambda: self.draw_layer_arrow(up_points, up_color))
         
         # Draw current layer number
-        layer_text = self.font.render(str(self.current_layer + 1), True, WHITE)
-        self.screen.blit(layer_text, (button_x + LAYER_BUTTON_SIZE//2 - layer_text.get_width()//2,
-                                    button_y + LAYER_BUTTON_SIZE + 10))
+        layer_text = self.render_text(str(self.current_layer + 1))
+        self.draw_region("layer", (button_x - 10, button_y + LAYER_BUTTON_SIZE + 5, LAYER_BUTTON_SIZE + 20, LAYER_BUTTON_SIZE - 10),
+                         self.current_layer,
+                         lambda: self.screen.blit(layer_text, (button_x + LAYER_BUTTON_SIZE//2 - layer_text.get_width()//2,
+                                                               button_y + LAYER_BUTTON_SIZE + 10)))
         
         # Draw down button
-        down_color = BUTTON_HOVER if (button_x <= mouse_pos[0] <= button_x + LAYER_BUTTON_SIZE and 
-                                    button_y + LAYER_BUTTON_SIZE * 2 <= mouse_pos[1] <= button_y + LAYER_BUTTON_SIZE * 3) else BUTTON_COLOR
-        pygame.draw.polygon(self.screen, down_color if self.current_layer > 0 else DARK_GRAY,
-                          [(button_x, button_y + LAYER_BUTTON_SIZE * 2),
-                           (button_x + LAYER_BUTTON_SIZE//2, button_y + LAYER_BUTTON_SIZE * 3),
-                           (button_x + LAYER_BUTTON_SIZE, button_y + LAYER_BUTTON_SIZE * 2)])
-        pygame.draw.polygon(self.screen, WHITE,
-                          [(button_x, button_y + LAYER_BUTTON_SIZE * 2),
-                           (button_x + LAYER_BUTTON_SIZE//2, button_y + LAYER_BUTTON_SIZE * 3),
-                           (button_x + LAYER_BUTTON_SIZE, button_y + LAYER_BUTTON_SIZE * 2)], 2)
-        
-        # Draw game over message
-        if self.message:
-            self.screen.blit(self.message, (WINDOW_SIZE[0]//2 - self.message.get_width()//2, 50))
-            
-            # If game is over and there's a winning combination, show navigation hint
-            if self.game_over and self.winning_combination:
-                hint = self.small_font.render("Use layer buttons to view winning combination", True, WHITE)
-                self.screen.blit(hint, (WINDOW_SIZE[0]//2 - hint.get_width()//2, 90))
-        
-        # Draw error message
-        if self.error_message and self.error_timer > 0:
-            self.screen.blit(self.error_message, (WINDOW_SIZE[0]//2 - self.error_message.get_width()//2, 50))
-            self.error_timer -= 1
+        down_hover = (button_x <= mouse_pos[0] <= button_x + LAYER_BUTTON_SIZE and
+                      button_y + LAYER_BUTTON_SIZE * 2 <= mouse_pos[1] <= button_y + LAYER_BUTTON_SIZE * 3)
+        down_color = (BUTTON_HOVER if down_hover else BUTTON_COLOR) if self.current_layer > 0 else DARK_GRAY
+        down_points = [(button_x, button_y + LAYER_BUTTON_SIZE * 2),
+                       (button_x + LAYER_BUTTON_SIZE//2, button_y + LAYER_BUTTON_SIZE * 3),
+                       (button_x + LAYER_BUTTON_SIZE, button_y + LAYER_BUTTON_SIZE * 2)]
+        self.draw_region("down", pygame.Rect(button_x, button_y + LAYER_BUTTON_SIZE * 2, LAYER_BUTTON_SIZE, LAYER_BUTTON_SIZE).inflate(4, 4),
+                         down_color, lambda: self.draw_layer_arrow(down_points, down_color))
     
     def show_error(self, message):
-        self.error_message = self.font.render(message, True, RED)
-        self.error_timer = 60  # Show for 1 second at 60 FPS
+        self.error_message = self.render_text(message, color=RED)
+        self.error_until = time.time() + ERROR_DURATION
         lose_sound.play()  # Changed from error_sound to lose_sound
     
     def handle_menu_click(self, pos):
@@ -355,8 +433,8 @@ class GameInterface:
 
     def handle_select_first_click(self, pos):
         x, y = pos
-        first_button = self.font.render("Player First" if self.player_turn else "AI First", True, WHITE)
-        start_button = self.font.render("Start", True, WHITE)
+        first_button = self.render_text("Player First" if self.player_turn else "AI First")
+        start_button = self.render_text("Start")
 
         toggle_button = pygame.Rect(WINDOW_SIZE[0]//2 - first_button.get_width()//2, 300,
                                   first_button.get_width(), first_button.get_height())
@@ -389,7 +467,7 @@ class GameInterface:
                 self.current_layer -= 1
         
         # Only process board clicks if game is not over and AI is not thinking
-        if not self.game_over and not self.ai_thinking:
+        if not self.game_over and not self.ai_thinking and not self.hint_thread:
             # Check board clicks
             if (MARGIN <= x <= MARGIN + BOARD_SIZE and 
                 TOP_MARGIN <= y <= TOP_MARGIN + BOARD_SIZE):
@@ -401,17 +479,21 @@ class GameInterface:
                     click_sound.play()
                     self.main_module.make_move(board_x, board_y, self.current_layer + 1, self.main_module.PLAYER)
                     self.last_player_move = (board_x, board_y, self.current_layer + 1)
+                    self.hint = None
+                    self.record_move(self.last_player_move, self.main_module.PLAYER)
                     
                     if self.main_module.check_win(self.main_module.PLAYER):
                         win_sound.play()
                         self.scores['player'] += 1
                         self.save_scores()
-                        self.message = self.font.render("Player Wins!", True, RED)
+                        self.record_game(self.main_module.PLAYER)
+                        self.message = self.render_text("Player Wins!", color=RED)
                         self.game_over = True
                         self.winning_combination = self.main_module.get_winning_combination()
                         self.winning_player = self.main_module.PLAYER
                     elif self.main_module.board_full():
-                        self.message = self.font.render("Draw!", True, WHITE)
+                        self.record_game(0)
+                        self.message = self.render_text("Draw!")
                         self.game_over = True
                     else:
                         self.ai_thinking = True
@@ -421,8 +503,23 @@ class GameInterface:
                 else:
                     self.show_error("Invalid move! Check gravity rule.")
     
+    def request_hint(self):
+        """Starts a short multi-PV analysis of the player's options in the background"""
+        if self.game_over or self.ai_thinking or self.hint_thread:
+            return
+        self.hint_thread = threading.Thread(target=self.make_hint)
+        self.hint_thread.start()
+
+    def make_hint(self):
+        lines = self.main_module.analyze(k=3, time_limit=HINT_TIME, player=self.main_module.PLAYER)
+        self.hint = lines[0]["move"] if lines else None
+
+    def on_search_info(self, info):
+        self.search_info = info
+
     def make_ai_move(self):
-        ai_x, ai_y, ai_z = self.main_module.ai_move()
+        self.search_info = None
+        ai_x, ai_y, ai_z = self.main_module.ai_move(on_iteration=self.on_search_info)
         self.ai_move_result = (ai_x, ai_y, ai_z)
     
     def reset_game(self):
@@ -431,10 +528,15 @@ class GameInterface:
         self.game_over = False
         self.message = None
         self.error_message = None
-        self.error_timer = 0
+        self.error_until = 0
         self.ai_thinking = False
+        self.hint = None
+        self.hint_thread = None
+        self.search_info = None
         self.last_player_move = None
         self.last_ai_move = None
+        self.move_history = []
+        self.first_mover = None
         self.player_turn = True  # Reset to default player first
         self.ai_move_thread = None
         self.ai_move_result = None
@@ -444,6 +546,9 @@ class GameInterface:
     def run(self):
         while True:
             for event in pygame.event.get():
+                if event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN):
+                    self.last_input = time.time()
+
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -453,9 +558,8 @@ class GameInterface:
                         if self.state == GAME:
                             self.reset_game()
                         self.state = MENU
-                        # Force redraw of menu
-                        self.screen.fill(BACKGROUND_COLOR)
-                        pygame.display.flip()
+                    elif event.key == pygame.K_h and self.state == GAME:
+                        self.request_hint()
 
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if self.state == MENU:
@@ -465,12 +569,19 @@ class GameInterface:
                     elif self.state == GAME:
                         self.handle_game_click(event.pos)
 
+            # Show the hint on its layer once analysis finishes
+            if self.hint_thread and not self.hint_thread.is_alive():
+                self.hint_thread = None
+                if self.hint:
+                    self.current_layer = self.hint[2] - 1
+
             # Check if AI move is ready
             if self.ai_thinking and self.ai_move_thread and not self.ai_move_thread.is_alive():
                 if self.ai_move_result:
                     ai_x, ai_y, ai_z = self.ai_move_result
                     self.main_module.make_move(ai_x, ai_y, ai_z, self.main_module.AI)
                     self.last_ai_move = (ai_x, ai_y, ai_z)
+                    self.record_move(self.last_ai_move, self.main_module.AI)
                     self.current_layer = ai_z - 1  # Switch to AI's layer
                     self.ai_thinking = False
                     self.ai_move_result = None
@@ -480,14 +591,23 @@ class GameInterface:
                         win_sound.play()
                         self.scores['ai'] += 1
                         self.save_scores()
-                        self.message = self.font.render("AI Wins!", True, BLUE)
+                        self.record_game(self.main_module.AI)
+                        self.message = self.render_text("AI Wins!", color=BLUE)
                         self.game_over = True
                         self.winning_combination = self.main_module.get_winning_combination()
                         self.winning_player = self.main_module.AI
                     elif self.main_module.board_full():
-                        self.message = self.font.render("Draw!", True, WHITE)
+                        self.record_game(0)
+                        self.message = self.render_text("Draw!")
                         self.game_over = True
 
+            # Any state change repaints the whole window once
+            if self.state != self.drawn_state:
+                self.drawn_state = self.state
+                self.invalidate()
+            if self.full_redraw:
+                self.screen.fill(BACKGROUND_COLOR)
+
             if self.state == MENU:
                 self.draw_menu()
             elif self.state == RULES:
@@ -499,8 +619,17 @@ class GameInterface:
             elif self.state == GAME:
                 self.draw_board()
 
-            pygame.display.flip()
-            self.clock.tick(60)
+            if self.full_redraw:
+                pygame.display.flip()
+            elif self.dirty_rects:
+                pygame.display.update(self.dirty_rects)
+            self.dirty_rects = []
+            self.full_redraw = False
+
+            # Drop to a low tick rate when nothing can change on screen
+            now = time.time()
+            active = self.ai_thinking or self.hint_thread is not None or now < self.error_until or now - self.last_input < IDLE_AFTER
+            self.clock.tick(ACTIVE_FPS if active else IDLE_FPS)
 
 if __name__ == "__main__":
     game = GameInterface()
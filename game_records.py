@@ -0,0 +1,152 @@
+import argparse
+import mmap
+import os
+import struct
+import numpy as np
+import minimax
+
+# File layout: an 8-byte file header, then back-to-back game records.
+# File header: magic, format version, board size, win length, 2 reserved bytes.
+# Game record: result (int8, 1: PLAYER won, -1: AI won, 0: draw), first mover (int8),
+# move count (uint16), then one byte per move holding the column index x * size + y
+# (0-based); z follows from gravity.
+MAGIC = b"C4R"
+VERSION = 1
+FILE_HEADER = struct.Struct("<3sBBBxx")
+GAME_HEADER = struct.Struct("<bbH")
+INDEX_DTYPE = np.dtype([("hash", np.uint64), ("game", np.uint32), ("ply", np.uint16)])
+
+class GameRecord:
+    def __init__(self, moves, result, first=minimax.PLAYER):
+        self.moves = moves  # [(x, y, z), ...], 1-based
+        self.result = result
+        self.first = first
+
+    def players(self):
+        """Yields the player of each move"""
+        player = self.first
+        for _ in self.moves:
+            yield player
+            player = -player
+
+def encode_moves(moves, size):
+    return bytes((x - 1) * size + (y - 1) for x, y, _ in moves)
+
+def decode_moves(data, size):
+    """Turns column bytes back into (x, y, z) moves by replaying gravity"""
+    heights = np.zeros(size * size, dtype=np.int32)
+    moves = []
+    for column in data:
+        heights[column] += 1
+        moves.append((column // size + 1, column % size + 1, int(heights[column])))
+    return moves
+
+class GameRecordFile:
+    """Append-only binary game log, read through mmap"""
+
+    def __init__(self, path, size=None, win_length=None):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) >= FILE_HEADER.size:
+            with open(path, 'rb') as f:
+                magic, version, self.size, self.win_length = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} game record file")
+        else:
+            self.size = size or minimax.BOARD_SIZE
+            self.win_length = win_length or minimax.WIN_LENGTH
+            with open(path, 'wb') as f:
+                f.write(FILE_HEADER.pack(MAGIC, VERSION, self.size, self.win_length))
+
+    def append(self, moves, result, first=minimax.PLAYER):
+        """Appends one finished game"""
+        with open(self.path, 'ab') as f:
+            f.write(GAME_HEADER.pack(result, first, len(moves)) + encode_moves(moves, self.size))
+
+    def __iter__(self):
+        for _, record in self.scan():
+            yield record
+
+    def scan(self):
+        """Yields (offset, GameRecord) for every game in the file"""
+        if os.path.getsize(self.path) <= FILE_HEADER.size:
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = FILE_HEADER.size
+            while offset + GAME_HEADER.size <= len(data):
+                result, first, count = GAME_HEADER.unpack_from(data, offset)
+                start = offset + GAME_HEADER.size
+                if start + count > len(data):
+                    break  # Torn final record from an interrupted append
+                yield offset, GameRecord(decode_moves(data[start:start + count], self.size), result, first)
+                offset = start + count
+
+def position_hashes(record, size):
+    """Zobrist hash of the position after each ply of a game, using the engine's keys"""
+    h = 0
+    hashes = []
+    for (x, y, z), player in zip(record.moves, record.players()):
+        h ^= int(minimax.zobrist[x - 1, y - 1, z - 1, 0 if player == minimax.PLAYER else 1])
+        hashes.append(h)
+    return hashes
+
+class PositionIndex:
+    """Sorted (hash, game, ply) table answering "which games reached this position" """
+
+    def __init__(self, entries, results):
+        self.entries = entries
+        self.results = results  # Result of each game, by game number
+
+    @classmethod
+    def build(cls, records):
+        """Indexes every position of every game in a GameRecordFile"""
+        if minimax.BOARD_SIZE != records.size:
+            raise ValueError("configure the engine for the record file's board size first")
+        chunks, results = [], []
+        for game, record in enumerate(records):
+            hashes = position_hashes(record, records.size)
+            chunk = np.zeros(len(hashes), dtype=INDEX_DTYPE)
+            chunk["hash"] = hashes
+            chunk["game"] = game
+            chunk["ply"] = np.arange(1, len(hashes) + 1)
+            chunks.append(chunk)
+            results.append(record.result)
+        entries = np.concatenate(chunks) if chunks else np.zeros(0, dtype=INDEX_DTYPE)
+        entries.sort(order=("hash", "game"))
+        return cls(entries, np.array(results, dtype=np.int8))
+
+    def save(self, path):
+        np.savez(path, entries=self.entries, results=self.results)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["entries"], data["results"])
+
+    def lookup(self, position_hash):
+        """Returns [(game, ply, result), ...] for every game that reached the position"""
+        hashes = self.entries["hash"]
+        key = np.uint64(position_hash)
+        lo = np.searchsorted(hashes, key, side='left')
+        hi = np.searchsorted(hashes, key, side='right')
+        return [(int(e["game"]), int(e["ply"]), int(self.results[e["game"]])) for e in self.entries[lo:hi]]
+
+    def summary(self, position_hash):
+        """Counts PLAYER wins, AI wins and draws among games that reached the position"""
+        games = {game: result for game, _, result in self.lookup(position_hash)}
+        results = list(games.values())
+        return {"games": len(results), "player": results.count(minimax.PLAYER),
+                "ai": results.count(minimax.AI), "draw": results.count(0)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the position index for a .c4r game record file")
+    parser.add_argument("records")
+    parser.add_argument("--out", default=None, help="index file (default: <records>.idx.npz)")
+    args = parser.parse_args()
+    records = GameRecordFile(args.records)
+    minimax.configure(records.size, records.win_length)
+    index = PositionIndex.build(records)
+    index.save(args.out or args.records + ".idx.npz")
+    print(f"{len(index.results)} games, {len(index.entries)} positions indexed")
+
+if __name__ == "__main__":
+    main()
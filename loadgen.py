@@ -0,0 +1,83 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+
+def call(base_url, method, path, body=None):
+    """Sends a JSON request and returns (status, body)"""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+def play_games(base_url, games, time_budget, seed, results):
+    """Plays games with random legal moves, recording the latency of every move request"""
+    rng = random.Random(seed)
+    for _ in range(games):
+        status, game = call(base_url, "POST", "/games", {"time_budget": time_budget})
+        if status != 201:
+            results["errors"][status] = results["errors"].get(status, 0) + 1
+            continue
+        while game["status"] == "playing":
+            board = np.array(game["board"])
+            size = board.shape[0]
+            columns = [(x + 1, y + 1) for x in range(size) for y in range(size) if board[x, y, -1] == 0]
+            x, y = rng.choice(columns)
+            start = time.perf_counter()
+            status, body = call(base_url, "POST", f"/games/{game['id']}/move",
+                                {"x": x, "y": y, "time_budget": time_budget})
+            elapsed = time.perf_counter() - start
+            if status == 200:
+                results["latencies"].append(elapsed)
+                game = body
+            else:
+                results["errors"][status] = results["errors"].get(status, 0) + 1
+                if status == 503:
+                    time.sleep(0.1)
+                elif status != 504:
+                    break
+        call(base_url, "DELETE", f"/games/{game['id']}")
+        results["games"] += 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for engine_service.py on localhost")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent players")
+    parser.add_argument("--games", type=int, default=2, help="games per client")
+    parser.add_argument("--time-budget", type=float, default=0.2)
+    args = parser.parse_args()
+
+    per_client = [{"latencies": [], "errors": {}, "games": 0} for _ in range(args.clients)]
+    threads = [threading.Thread(target=play_games, args=(args.url, args.games, args.time_budget, i, per_client[i]))
+               for i in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies = np.array([v for r in per_client for v in r["latencies"]])
+    errors = {}
+    for r in per_client:
+        for status, count in r["errors"].items():
+            errors[status] = errors.get(status, 0) + count
+    print(f"games: {sum(r['games'] for r in per_client)}  moves: {len(latencies)}  "
+          f"wall: {wall:.1f}s  throughput: {len(latencies) / wall:.1f} moves/s")
+    if len(latencies):
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+        print(f"client latency ms  p50: {p50:.0f}  p90: {p90:.0f}  p99: {p99:.0f}  max: {latencies.max() * 1000:.0f}")
+    print(f"errors by status: {errors or 'none'}")
+    _, stats = call(args.url, "GET", "/stats")
+    print(f"server stats: {stats}")
+
+if __name__ == "__main__":
+    main()
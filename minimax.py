@@ -1,9 +1,17 @@
+import contextlib
+import io
+import json
 import numpy as np
+import os
+import threading
 import time
-from numba import jit
+from concurrent.futures import ThreadPoolExecutor
+from numba import jit, prange
 
 # Board and constants
-board = np.zeros((5, 5, 5), dtype=np.int32)  # 0: empty, 1: player, -1: AI
+BOARD_SIZE = 5  # Board is BOARD_SIZE x BOARD_SIZE x BOARD_SIZE
+WIN_LENGTH = 4  # Pieces in a row needed to win
+board = np.zeros((BOARD_SIZE, BOARD_SIZE, BOARD_SIZE), dtype=np.int32)  # 0: empty, 1: player, -1: AI
 PLAYER = 1
 AI = -1
 directions = np.array([
@@ -12,26 +20,129 @@ directions = np.array([
     [1, 0, 1], [-1, 0, -1], [1, 0, -1], [-1, 0, 1],  # xz diagonals
     [0, 1, 1], [0, -1, -1], [0, 1, -1], [0, -1, 1],  # yz diagonals
     [1, 1, 1], [-1, -1, -1], [1, 1, -1], [-1, -1, 1], [1, -1, 1], [-1, 1, -1], [1, -1, -1], [-1, 1, 1]  # 3D diagonals
-], dtype=np.int32)
-transposition_table = {}  # Transposition table for caching
+], dtype=np.int32)  # Opposite directions are adjacent, so even rows are one per line orientation
+lines = None  # (L, WIN_LENGTH, 3) array of every winning line, 0-based
+line_cells = None  # (L, WIN_LENGTH) flat board indices of the same lines
+zobrist = None  # (BOARD_SIZE, BOARD_SIZE, BOARD_SIZE, 2) random keys for position hashing
+position_hash = 0  # Zobrist hash of board, kept in sync by make_move/undo_move
+nodes_searched = 0  # Nodes visited by minimax, for benchmarking
+node_limit = None  # nodes_searched value at which minimax gives up, as at its deadline; set by search_iter
+stop_search = threading.Event()  # Set from another thread to abandon the running search
+transposition_table = {}  # (hash, depth, maximizing) -> (score, moves_to_win, bound, best move); see shared_tt for a shared one
+EXACT, LOWER, UPPER = 0, 1, 2  # Bound types of transposition table scores
 MAX_CACHE_SIZE = 1000000  # Reduced cache size for efficiency
 EARLY_DEPTH_LIMIT = 4  # Depth for early game
-LATE_GAME_THRESHOLD = 31  # >50% board filled
+LATE_GAME_THRESHOLD = 31  # Quarter of the board filled
 TIME_LIMIT = 2.0  # Max seconds per AI move
+USE_NULL_MOVE = False  # Verified null-move pruning
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+USE_LMR = False  # Late-move reductions
+LMR_FULL_MOVES = 4  # Moves searched at full depth before reductions start
+LMR_MIN_DEPTH = 3
+LMR_REDUCTION = 1
+SELECTIVE_DEPTH_BONUS = 2  # Extra depth allowed when either selective search is on
+QUIESCENCE_PLIES = 4  # Forcing moves searched past the horizon; 0 turns quiescence off
+SCORE_BOUND = 1000000  # Beyond any evaluation; the quiescence window starts at +-SCORE_BOUND
+# Strength levels: a node budget per move, an optional depth cap and the size of a deterministic
+# per-position evaluation noise. A level ignores TIME_LIMIT, so a move costs the same number of
+# nodes on any machine and the same position always gets the same reply. Budgets are for 5x5x5;
+# level_budget scales them with the square of the column count, as the cost of depth 1 grows.
+LEVELS = {
+    1: {"nodes": 1000, "depth": 1, "noise": 4000},
+    2: {"nodes": 10000, "depth": 2, "noise": 1500},
+    3: {"nodes": 100000, "depth": 3, "noise": 400},
+    4: {"nodes": 150000, "depth": None, "noise": 0},
+    5: {"nodes": 300000, "depth": None, "noise": 0},
+}
+level = None  # Active LEVELS entry, set by set_level; None searches by TIME_LIMIT
+eval_noise = 0  # Leaf scores are shifted by up to +-eval_noise
+noise_seed = 0  # Varies the noise between otherwise identical games
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json")
+# Evaluation weights, in the order of the feature vector from position_features_numba
+WEIGHT_NAMES = ("win", "triple_early", "triple_late", "triple_open_early", "triple_open_late",
+                "double_open", "center", "center_cell", "edge")
+DEFAULT_WEIGHTS = (100000, 3000, 5000, 8000, 10000, 500, 10, 50, 5)
+(W_WIN, W_TRIPLE_EARLY, W_TRIPLE_LATE, W_TRIPLE_OPEN_EARLY, W_TRIPLE_OPEN_LATE,
+ W_DOUBLE_OPEN, W_CENTER, W_CENTER_CELL, W_EDGE) = range(len(WEIGHT_NAMES))
+N_WEIGHTS = len(WEIGHT_NAMES)
+_thread_pool = None  # Shared pool for GIL-free kernel calls
+_thread_pool_workers = 0  # Its number of threads
+_thread_pool_lock = threading.Lock()
+
+def build_lines(size, win_length):
+    """Returns every line of win_length cells on a size^3 board"""
+    result = []
+    for dx, dy, dz in directions[::2]:
+        for x in range(size):
+            for y in range(size):
+                for z in range(size):
+                    ex, ey, ez = x + dx * (win_length - 1), y + dy * (win_length - 1), z + dz * (win_length - 1)
+                    if 0 <= ex < size and 0 <= ey < size and 0 <= ez < size:
+                        result.append([(x + dx * i, y + dy * i, z + dz * i) for i in range(win_length)])
+    return np.array(result, dtype=np.int32).reshape(-1, win_length, 3)
+
+def configure(size=5, win_length=4, seed=0):
+    """Resets the engine for a size^3 board with win_length in a row"""
+    global BOARD_SIZE, WIN_LENGTH, LATE_GAME_THRESHOLD, board, lines, line_cells, zobrist, position_hash
+    if not 1 < win_length <= size:
+        raise ValueError("win_length must be between 2 and the board size")
+    BOARD_SIZE = size
+    WIN_LENGTH = win_length
+    LATE_GAME_THRESHOLD = size ** 3 // 4
+    board = np.zeros((size, size, size), dtype=np.int32)
+    lines = build_lines(size, win_length)
+    line_cells = ((lines[..., 0] * size + lines[..., 1]) * size + lines[..., 2]).astype(np.int64)
+    rng = np.random.default_rng(seed)
+    zobrist = rng.integers(1, 2 ** 63, size=(size, size, size, 2), dtype=np.uint64)
+    position_hash = 0
+    transposition_table.clear()
+
+def load_weights(path=None):
+    """Loads evaluation weights from a JSON file of name -> value, falling back to the defaults"""
+    global weights
+    path = path or WEIGHTS_FILE
+    values = dict(zip(WEIGHT_NAMES, DEFAULT_WEIGHTS))
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            values.update({name: int(round(value)) for name, value in json.load(f).items() if name in values})
+    weights = np.array([values[name] for name in WEIGHT_NAMES], dtype=np.int64)
+    return weights
+
+def save_weights(values, path=None):
+    """Writes evaluation weights (a sequence in WEIGHT_NAMES order) to a JSON file"""
+    with open(path or WEIGHTS_FILE, 'w') as f:
+        json.dump({name: int(round(value)) for name, value in zip(WEIGHT_NAMES, values)}, f, indent=2)
+
+def compute_hash(b):
+    """Computes the Zobrist hash of a board from scratch"""
+    h = np.bitwise_xor.reduce(zobrist[..., 0][b == PLAYER]) if np.any(b == PLAYER) else 0
+    if np.any(b == AI):
+        h ^= np.bitwise_xor.reduce(zobrist[..., 1][b == AI])
+    return int(h)
+
+def set_board(state):
+    """Replaces the board contents and recomputes its hash"""
+    global position_hash
+    board[...] = state
+    position_hash = compute_hash(board)
+
+configure(BOARD_SIZE, WIN_LENGTH)
+weights = load_weights()
 
 def print_board():
-    """Prints the board layer by layer (z=1..5)"""
-    for z in range(5):
+    """Prints the board layer by layer (z=1..BOARD_SIZE)"""
+    for z in range(BOARD_SIZE):
         print(f"z={z + 1}:")
-        for x in range(5):
-            row = ['R' if board[x, y, z] == PLAYER else 'B' if board[x, y, z] == AI else '.' for y in range(5)]
+        for x in range(BOARD_SIZE):
+            row = ['R' if board[x, y, z] == PLAYER else 'B' if board[x, y, z] == AI else '.' for y in range(BOARD_SIZE)]
             print(' '.join(row))
         print()
 
 def valid_move(x, y, z):
     """Checks if a move at (x, y, z) is valid"""
     x, y, z = x - 1, y - 1, z - 1
-    if not (0 <= x < 5 and 0 <= y < 5 and 0 <= z < 5):
+    if not (0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE and 0 <= z < BOARD_SIZE):
         return False
     if board[x, y, z] != 0:
         return False
@@ -41,58 +152,69 @@ def valid_move(x, y, z):
 
 def make_move(x, y, z, player):
     """Places a piece for the player at (x, y, z)"""
+    global position_hash
     x, y, z = x - 1, y - 1, z - 1
     board[x, y, z] = player
+    position_hash ^= int(zobrist[x, y, z, 0 if player == PLAYER else 1])
+
+def undo_move(x, y, z):
+    """Removes the piece at (x, y, z)"""
+    global position_hash
+    x, y, z = x - 1, y - 1, z - 1
+    position_hash ^= int(zobrist[x, y, z, 0 if board[x, y, z] == PLAYER else 1])
+    board[x, y, z] = 0
 
-@jit(nopython=True)
-def check_win_numba(board, player, last_move=None):
-    """Checks if the player has won (4 in a row)"""
+@jit(nopython=True, nogil=True, cache=True)
+def check_win_numba(board, player, directions, win_length, last_move=None):
+    """Checks if the player has won (win_length in a row)"""
+    n = board.shape[0]
     if last_move is not None:
         x, y, z = last_move[0] - 1, last_move[1] - 1, last_move[2] - 1
         if board[x, y, z] != player:
             return False
-        for d in range(directions.shape[0]):
+        # Scanning both ways makes d and -d equivalent, so one of each pair suffices
+        for d in range(0, directions.shape[0], 2):
             dx, dy, dz = directions[d]
             count = 1
-            for step in range(1, 4):
+            for step in range(1, win_length):
                 nx, ny, nz = x + dx * step, y + dy * step, z + dz * step
-                if 0 <= nx < 5 and 0 <= ny < 5 and 0 <= nz < 5 and board[nx, ny, nz] == player:
+                if 0 <= nx < n and 0 <= ny < n and 0 <= nz < n and board[nx, ny, nz] == player:
                     count += 1
                 else:
                     break
-            for step in range(1, 4):
+            for step in range(1, win_length):
                 nx, ny, nz = x - dx * step, y - dy * step, z - dz * step
-                if 0 <= nx < 5 and 0 <= ny < 5 and 0 <= nz < 5 and board[nx, ny, nz] == player:
+                if 0 <= nx < n and 0 <= ny < n and 0 <= nz < n and board[nx, ny, nz] == player:
                     count += 1
                 else:
                     break
-            if count >= 4:
+            if count >= win_length:
                 return True
         return False
     else:
-        for x in range(5):
-            for y in range(5):
-                for z in range(5):
+        for x in range(n):
+            for y in range(n):
+                for z in range(n):
                     if board[x, y, z] != player:
                         continue
                     for d in range(directions.shape[0]):
                         dx, dy, dz = directions[d]
                         count = 1
-                        for step in range(1, 4):
+                        for step in range(1, win_length):
                             nx, ny, nz = x + dx * step, y + dy * step, z + dz * step
-                            if 0 <= nx < 5 and 0 <= ny < 5 and 0 <= nz < 5 and board[nx, ny, nz] == player:
+                            if 0 <= nx < n and 0 <= ny < n and 0 <= nz < n and board[nx, ny, nz] == player:
                                 count += 1
                             else:
                                 break
-                        if count >= 4:
+                        if count >= win_length:
                             return True
         return False
 
 def check_win(player, last_move=None):
     """Wrapper for check_win_numba"""
     if last_move:
-        return check_win_numba(board, player, np.array(last_move, dtype=np.int32))
-    return check_win_numba(board, player)
+        return check_win_numba(board, player, directions, WIN_LENGTH, np.array(last_move, dtype=np.int32))
+    return check_win_numba(board, player, directions, WIN_LENGTH)
 
 def board_full():
     """Checks if the board is full"""
@@ -100,37 +222,34 @@ def board_full():
 
 def get_valid_moves():
     """Returns a list of valid moves (x, y, z)"""
-    moves = []
-    for x in range(5):
-        for y in range(5):
-            for z in range(5):
-                if valid_move(x + 1, y + 1, z + 1):
-                    moves.append((x + 1, y + 1, z + 1))
-    return moves
-
-@jit(nopython=True)
-def evaluate_position_numba(board, move_count):
-    """Evaluates the board position"""
-    score = 0
+    heights = np.count_nonzero(board, axis=2)  # Gravity keeps every column packed from z=1
+    return [(x + 1, y + 1, int(heights[x, y]) + 1)
+            for x in range(BOARD_SIZE) for y in range(BOARD_SIZE) if heights[x, y] < BOARD_SIZE]
+
+@jit(nopython=True, nogil=True, cache=True)
+def position_features_numba(board, move_count, directions, win_length):
+    """Counts the evaluation features of a position; the score is their dot product with the weights"""
+    n = board.shape[0]
+    features = np.zeros(N_WEIGHTS, dtype=np.int64)
     moves_to_win = 100
-    late_game = move_count > LATE_GAME_THRESHOLD
-    triple_weight = 5000 if late_game else 3000
-    triple_open_weight = 10000 if late_game else 8000
-    double_open_weight = 500
-
-    for x in range(5):
-        for y in range(5):
-            for z in range(5):
+    late_game = move_count > board.size // 4
+    triple = W_TRIPLE_LATE if late_game else W_TRIPLE_EARLY
+    triple_open = W_TRIPLE_OPEN_LATE if late_game else W_TRIPLE_OPEN_EARLY
+
+    for x in range(n):
+        for y in range(n):
+            for z in range(n):
                 if board[x, y, z] == 0:
                     continue
                 player = board[x, y, z]
-                for d in range(directions.shape[0]):
+                # d and -d score identically, so count one of each pair twice
+                for d in range(0, directions.shape[0], 2):
                     dx, dy, dz = directions[d]
                     count = 1
                     open_ends = 0
-                    for step in range(1, 4):
+                    for step in range(1, win_length):
                         nx, ny, nz = x + dx * step, y + dy * step, z + dz * step
-                        if 0 <= nx < 5 and 0 <= ny < 5 and 0 <= nz < 5:
+                        if 0 <= nx < n and 0 <= ny < n and 0 <= nz < n:
                             if board[nx, ny, nz] == player:
                                 count += 1
                             elif board[nx, ny, nz] == 0:
@@ -138,9 +257,9 @@ def evaluate_position_numba(board, move_count):
                                 break
                             else:
                                 break
-                    for step in range(1, 4):
+                    for step in range(1, win_length):
                         nx, ny, nz = x - dx * step, y - dy * step, z - dz * step
-                        if 0 <= nx < 5 and 0 <= ny < 5 and 0 <= nz < 5:
+                        if 0 <= nx < n and 0 <= ny < n and 0 <= nz < n:
                             if board[nx, ny, nz] == player:
                                 count += 1
                             elif board[nx, ny, nz] == 0:
@@ -148,35 +267,166 @@ def evaluate_position_numba(board, move_count):
                                 break
                             else:
                                 break
-                    if count >= 4:
-                        score += 100000 * player
+                    if count >= win_length:
+                        features[W_WIN] += 2 * player
                         moves_to_win = 0 if player == AI else -1
-                    elif count == 3 and open_ends >= 1:
-                        score += (triple_open_weight if open_ends >= 2 else triple_weight) * player
+                    elif count == win_length - 1 and open_ends >= 1:
+                        features[triple_open if open_ends >= 2 else triple] += 2 * player
                         moves_to_win = min(moves_to_win, 1 if player == AI else -1)
-                    elif count == 2 and open_ends >= 2:
-                        score += double_open_weight * player
+                    elif count == win_length - 2 and open_ends >= 2:
+                        features[W_DOUBLE_OPEN] += 2 * player
                         moves_to_win = min(moves_to_win, 2 if player == AI else -2)
 
     # Center and edge bonuses
-    center = board[1:4, 1:4, 1:4]
-    score += 10 * np.sum(center * center)
-    if board[2, 2, 2] != 0:
-        score += 50 * board[2, 2, 2]
-    for x in range(5):
-        for y in range(5):
-            for z in range(5):
-                if board[x, y, z] != 0 and (x in (0, 4) or y in (0, 4) or z in (0, 4)):
-                    score += 5 * board[x, y, z]
+    center = board[1:n - 1, 1:n - 1, 1:n - 1]
+    features[W_CENTER] = np.sum(center * center)
+    features[W_CENTER_CELL] = board[n // 2, n // 2, n // 2]
+    for x in range(n):
+        for y in range(n):
+            for z in range(n):
+                if board[x, y, z] != 0 and (x == 0 or x == n - 1 or y == 0 or y == n - 1 or z == 0 or z == n - 1):
+                    features[W_EDGE] += board[x, y, z]
+    return features, moves_to_win
+
+@jit(nopython=True, nogil=True, cache=True)
+def evaluate_position_numba(board, move_count, directions, win_length, weights):
+    """Evaluates the board position"""
+    features, moves_to_win = position_features_numba(board, move_count, directions, win_length)
+    score = 0
+    for i in range(N_WEIGHTS):
+        score += features[i] * weights[i]
     return score, moves_to_win
 
+@jit(nopython=True, parallel=True, cache=True)
+def position_features_batch_numba(boards, move_counts, directions, win_length):
+    """Feature rows for (N, n, n, n) boards in parallel, for weight tuning"""
+    features = np.zeros((boards.shape[0], N_WEIGHTS), dtype=np.int64)
+    for i in prange(boards.shape[0]):
+        features[i], _ = position_features_numba(boards[i], move_counts[i], directions, win_length)
+    return features
+
 def evaluate_position(move_count):
     """Wrapper for evaluate_position_numba"""
-    return evaluate_position_numba(board, move_count)
+    return evaluate_position_numba(board, move_count, directions, WIN_LENGTH, weights)
+
+def quiescence(player, move_count):
+    """Leaf value of the current board with player to move, after quiescence_numba if it is enabled"""
+    score, moves_to_win = evaluate_position(move_count)
+    if QUIESCENCE_PLIES <= 0:
+        return score, moves_to_win
+    heights = np.count_nonzero(board, axis=2).astype(np.int64).reshape(-1)
+    return quiescence_numba(board.copy(), heights, player, -SCORE_BOUND, SCORE_BOUND, score, moves_to_win, move_count,
+                            QUIESCENCE_PLIES, directions, WIN_LENGTH, weights, line_cells)
+
+@jit(nopython=True, nogil=True, cache=True)
+def evaluate_chunk_numba(boards, move_counts, directions, win_length, weights, scores, moves_to_win):
+    """Evaluates a chunk of boards into preallocated outputs without holding the GIL"""
+    for i in range(boards.shape[0]):
+        scores[i], moves_to_win[i] = evaluate_position_numba(boards[i], move_counts[i], directions, win_length, weights)
+
+def get_thread_pool(max_workers=None):
+    """Returns (pool, threads) for the shared thread pool, creating it on first use.
+
+    A max_workers different from the current pool's replaces it; callers still
+    holding the old pool can finish with it, and its threads exit once it is
+    no longer referenced. None keeps whatever pool exists.
+    """
+    global _thread_pool, _thread_pool_workers
+    with _thread_pool_lock:
+        if _thread_pool is None or (max_workers and max_workers != _thread_pool_workers):
+            _thread_pool_workers = max_workers or os.cpu_count() or 1
+            _thread_pool = ThreadPoolExecutor(max_workers=_thread_pool_workers)
+        return _thread_pool, _thread_pool_workers
+
+def evaluate_positions_threaded(boards, move_counts=None, max_workers=None):
+    """Scores many candidate boards in parallel on the shared thread pool.
 
-@jit(nopython=True)
-def check_threats_numba(board, player, valid_moves, move_count):
-    """Checks for moves creating triples with open ends"""
+    Each worker runs evaluate_chunk_numba on a contiguous slice, so the whole
+    slice is scored with the GIL released. Returns (scores, moves_to_win) arrays.
+    """
+    boards = np.ascontiguousarray(boards, dtype=np.int32)
+    n = boards.shape[0]
+    scores = np.zeros(n, dtype=np.int64)
+    moves_to_win = np.zeros(n, dtype=np.int64)
+    if n == 0:
+        return scores, moves_to_win
+    if move_counts is None:
+        move_counts = np.count_nonzero(boards.reshape(n, -1), axis=1)
+    move_counts = np.ascontiguousarray(move_counts, dtype=np.int64)
+    pool, workers = get_thread_pool(max_workers)
+    chunk = max(1, -(-n // workers))
+    futures = [pool.submit(evaluate_chunk_numba, boards[i:i + chunk], move_counts[i:i + chunk], directions,
+                           WIN_LENGTH, weights, scores[i:i + chunk], moves_to_win[i:i + chunk])
+               for i in range(0, n, chunk)]
+    for future in futures:
+        future.result()
+    return scores, moves_to_win
+
+@jit(nopython=True, parallel=True, cache=True)
+def evaluate_batch_numba(boards, move_counts, directions, win_length, weights):
+    """Evaluates (N, n, n, n) boards in parallel; a negative move count means count the pieces"""
+    count = boards.shape[0]
+    scores = np.zeros(count, dtype=np.int64)
+    moves_to_win = np.zeros(count, dtype=np.int64)
+    for i in prange(count):
+        move_count = move_counts[i]
+        if move_count < 0:
+            move_count = np.count_nonzero(boards[i])
+        scores[i], moves_to_win[i] = evaluate_position_numba(boards[i], move_count, directions, win_length, weights)
+    return scores, moves_to_win
+
+@jit(nopython=True, parallel=True, cache=True)
+def evaluate_packed_batch_numba(packed, size, move_counts, directions, win_length, weights):
+    """Evaluates (N, 2, words) bitboards in parallel, unpacking each into a private scratch board"""
+    count = packed.shape[0]
+    cells = size * size * size
+    scores = np.zeros(count, dtype=np.int64)
+    moves_to_win = np.zeros(count, dtype=np.int64)
+    for i in prange(count):
+        flat = np.zeros(cells, dtype=np.int32)
+        pieces = 0
+        for cell in range(cells):
+            word, bit = cell // 64, np.uint64(cell % 64)
+            if (packed[i, 0, word] >> bit) & np.uint64(1):
+                flat[cell] = PLAYER
+                pieces += 1
+            elif (packed[i, 1, word] >> bit) & np.uint64(1):
+                flat[cell] = AI
+                pieces += 1
+        move_count = move_counts[i] if move_counts[i] >= 0 else pieces
+        scores[i], moves_to_win[i] = evaluate_position_numba(flat.reshape((size, size, size)), move_count,
+                                                             directions, win_length, weights)
+    return scores, moves_to_win
+
+def pack_boards(boards):
+    """Packs (N, n, n, n) boards into (N, 2, words) uint64 bitboards: plane 0 player, plane 1 AI"""
+    boards = np.asarray(boards)
+    flat = boards.reshape(boards.shape[0], -1)
+    words = -(-flat.shape[1] // 64)
+    bits = np.zeros((flat.shape[0], 2, words * 64), dtype=np.uint8)
+    bits[:, 0, :flat.shape[1]] = flat == PLAYER
+    bits[:, 1, :flat.shape[1]] = flat == AI
+    return np.packbits(bits, axis=-1, bitorder='little').view(np.uint64)
+
+def evaluate_batch(boards, move_counts=None):
+    """Scores many boards in one compiled parallel call.
+
+    boards is either an (N, n, n, n) array or the (N, 2, words) uint64 output of
+    pack_boards. move_counts defaults to the number of pieces on each board.
+    Returns (scores, moves_to_win) arrays of length N.
+    """
+    boards = np.asarray(boards)
+    count = boards.shape[0]
+    move_counts = np.full(count, -1, dtype=np.int64) if move_counts is None else np.asarray(move_counts, dtype=np.int64)
+    if boards.dtype == np.uint64 and boards.ndim == 3:
+        return evaluate_packed_batch_numba(boards, BOARD_SIZE, move_counts, directions, WIN_LENGTH, weights)
+    return evaluate_batch_numba(np.ascontiguousarray(boards, dtype=np.int32), move_counts, directions, WIN_LENGTH, weights)
+
+@jit(nopython=True, nogil=True, cache=True)
+def check_threats_numba(board, player, valid_moves, move_count, directions, win_length):
+    """Checks for moves creating win_length-1 in a row with open ends"""
+    n = board.shape[0]
+    board = board.copy()  # Work on a private copy so concurrent callers never see trial pieces
     threats = np.zeros((len(valid_moves), 4), dtype=np.int32)  # [x, y, z, score]
     threat_count = 0
     min_score = 3000
@@ -185,13 +435,13 @@ def check_threats_numba(board, player, valid_moves, move_count):
         x, y, z = valid_moves[i]
         board[x - 1, y - 1, z - 1] = player
         score = 0
-        for d in range(directions.shape[0]):
+        for d in range(0, directions.shape[0], 2):
             dx, dy, dz = directions[d]
             count = 1
             open_ends = 0
-            for step in range(1, 4):
+            for step in range(1, win_length):
                 nx, ny, nz = x - 1 + dx * step, y - 1 + dy * step, z - 1 + dz * step
-                if 0 <= nx < 5 and 0 <= ny < 5 and 0 <= nz < 5:
+                if 0 <= nx < n and 0 <= ny < n and 0 <= nz < n:
                     if board[nx, ny, nz] == player:
                         count += 1
                     elif board[nx, ny, nz] == 0:
@@ -199,9 +449,9 @@ def check_threats_numba(board, player, valid_moves, move_count):
                         break
                     else:
                         break
-            for step in range(1, 4):
+            for step in range(1, win_length):
                 nx, ny, nz = x - 1 - dx * step, y - 1 - dy * step, z - 1 - dz * step
-                if 0 <= nx < 5 and 0 <= ny < 5 and 0 <= nz < 5:
+                if 0 <= nx < n and 0 <= ny < n and 0 <= nz < n:
                     if board[nx, ny, nz] == player:
                         count += 1
                     elif board[nx, ny, nz] == 0:
@@ -209,30 +459,333 @@ def check_threats_numba(board, player, valid_moves, move_count):
                         break
                     else:
                         break
-            if count == 3 and open_ends >= 1:
-                score += 10000 if open_ends >= 2 else 5000
+            if count == win_length - 1 and open_ends >= 1:
+                score += 2 * (10000 if open_ends >= 2 else 5000)
         board[x - 1, y - 1, z - 1] = 0
         if score >= min_score:
             threats[threat_count] = [x, y, z, score]
             threat_count += 1
     return threats[:threat_count]
 
+@jit(nopython=True, nogil=True, cache=True)
+def score_children_numba(board, valid_moves, player, move_count, directions, win_length, weights, line_cells,
+                         quiesce_plies):
+    """Scores the position after each move: static eval for ordering plus leaf value and moves_to_win"""
+    board = board.copy()
+    n = board.shape[0]
+    heights = np.zeros(n * n, dtype=np.int64)
+    for x in range(n):
+        for y in range(n):
+            while heights[x * n + y] < n and board[x, y, heights[x * n + y]] != 0:
+                heights[x * n + y] += 1
+    k = valid_moves.shape[0]
+    evals = np.zeros(k, dtype=np.int64)
+    values = np.zeros(k, dtype=np.int64)
+    moves_to_win = np.zeros(k, dtype=np.int64)
+    last_empty = np.sum(board == 0) == 1
+    for i in range(k):
+        x, y, z = valid_moves[i]
+        board[x - 1, y - 1, z - 1] = player
+        score, mtw = evaluate_position_numba(board, move_count + 1, directions, win_length, weights)
+        evals[i] = score
+        if check_win_numba(board, player, directions, win_length, valid_moves[i]):
+            values[i] = 100000 if player == AI else -100000
+            moves_to_win[i] = 0 if player == AI else -1
+        elif last_empty:
+            values[i] = 0
+            moves_to_win[i] = 0
+        elif quiesce_plies > 0:
+            heights[(x - 1) * n + y - 1] += 1
+            values[i], moves_to_win[i] = quiescence_numba(board, heights, -player, -SCORE_BOUND, SCORE_BOUND, score,
+                                                          mtw, move_count + 1, quiesce_plies, directions, win_length,
+                                                          weights, line_cells)
+            heights[(x - 1) * n + y - 1] -= 1
+        else:
+            values[i] = score
+            moves_to_win[i] = mtw
+        board[x - 1, y - 1, z - 1] = 0
+    return evals, values, moves_to_win
+
+@jit(nopython=True, nogil=True, cache=True)
+def count_winning_moves_numba(board, player, directions, win_length):
+    """Counts the playable cells where player would complete a line"""
+    n = board.shape[0]
+    board = board.copy()
+    move = np.zeros(3, dtype=np.int32)
+    count = 0
+    for x in range(n):
+        for y in range(n):
+            z = 0
+            while z < n and board[x, y, z] != 0:
+                z += 1
+            if z == n:
+                continue
+            board[x, y, z] = player
+            move[0], move[1], move[2] = x + 1, y + 1, z + 1
+            if check_win_numba(board, player, directions, win_length, move):
+                count += 1
+            board[x, y, z] = 0
+    return count
+
+@jit(nopython=True, nogil=True, cache=True)
+def has_threat_numba(board, player, lines):
+    """True if some line is one player piece short of complete, whether or not the gap is playable yet"""
+    length = lines.shape[1]
+    for i in range(lines.shape[0]):
+        own = 0
+        empty = 0
+        for j in range(length):
+            v = board[lines[i, j, 0], lines[i, j, 1], lines[i, j, 2]]
+            if v == player:
+                own += 1
+            elif v == 0:
+                empty += 1
+        if own == length - 1 and empty == 1:
+            return True
+    return False
+
+@jit(nopython=True, nogil=True, cache=True)
+def tactical_moves_numba(board, valid_moves, player, lines):
+    """Marks moves that win, leave a line one player piece short, or fill the gap in an opponent's line"""
+    n = board.shape[0]
+    length = lines.shape[1]
+    column = -np.ones((n, n), dtype=np.int64)
+    for k in range(valid_moves.shape[0]):
+        column[valid_moves[k, 0] - 1, valid_moves[k, 1] - 1] = k
+    tactical = np.zeros(valid_moves.shape[0], dtype=np.bool_)
+    for i in range(lines.shape[0]):
+        own = 0
+        other = 0
+        for j in range(length):
+            v = board[lines[i, j, 0], lines[i, j, 1], lines[i, j, 2]]
+            if v == player:
+                own += 1
+            elif v != 0:
+                other += 1
+        if (other == 0 and own >= length - 2) or (own == 0 and other == length - 1):
+            for j in range(length):
+                x, y, z = lines[i, j, 0], lines[i, j, 1], lines[i, j, 2]
+                k = column[x, y]
+                if board[x, y, z] == 0 and k >= 0 and valid_moves[k, 2] == z + 1:
+                    tactical[k] = True
+    return tactical
+
+@jit(nopython=True, nogil=True, cache=True)
+def scan_drops_numba(cells, heights, player, line_cells, blocks, threats):
+    """One pass over the lines for a quiescence node with player to move.
+
+    cells is the flattened board and heights the flattened column heights. Returns True as
+    soon as player has a winning drop. Otherwise marks the columns of the opponent's winning
+    drops in blocks and of the drops that leave player two different wins playable next move
+    in threats, and returns False.
+    """
+    n = heights.shape[0]
+    length = line_cells.shape[1]
+    gaps = np.zeros(2, dtype=np.int64)
+    first_win = -np.ones(n, dtype=np.int64)  # Cell of the first win each drop sets up
+    for i in range(line_cells.shape[0]):
+        own = 0
+        other = 0
+        empty = 0
+        for j in range(length):
+            v = cells[line_cells[i, j]]
+            if v == 0:
+                if empty < 2:
+                    gaps[empty] = line_cells[i, j]
+                empty += 1
+            elif v == player:
+                own += 1
+            else:
+                other += 1
+        if empty == 1:
+            column, z = divmod(gaps[0], cells.shape[0] // n)
+            if heights[column] == z:
+                if own == length - 1:
+                    return True
+                if other == length - 1:
+                    blocks[column] = True
+        elif empty == 2 and own == length - 2:
+            for g in range(2):
+                column, z = divmod(gaps[g], cells.shape[0] // n)
+                other_column, other_z = divmod(gaps[1 - g], cells.shape[0] // n)
+                # The other gap must be playable once this drop is in, possibly right on top of it
+                if heights[column] == z and (heights[other_column] == other_z or gaps[1 - g] == gaps[g] + 1):
+                    if first_win[column] < 0:
+                        first_win[column] = gaps[1 - g]
+                    elif first_win[column] != gaps[1 - g]:
+                        threats[column] = True
+    return False
+
+@jit(nopython=True, nogil=True, cache=True)
+def quiescence_node_numba(board, heights, level, players, alphas, betas, score, moves_to_win, move_count, plies,
+                          directions, win_length, weights, line_cells, drops, best, best_moves_to_win, next_drop):
+    """Sets up one quiescence node; returns (True, score, moves_to_win) when it needs no children.
+
+    score is the node's static eval, or SCORE_BOUND if it has not been computed yet.
+    """
+    player = players[level]
+    win_score = 100000 if player == AI else -100000
+    drops[level] = False
+    threats = np.zeros(heights.shape[0], dtype=np.bool_)
+    if scan_drops_numba(board.reshape(-1), heights, player, line_cells, drops[level], threats):
+        return True, win_score, (0 if player == AI else -1) + 1
+    if move_count >= board.size:
+        return True, 0, 0
+    block_count = np.sum(drops[level])
+    if block_count > 1:
+        # One block cannot stop two wins
+        return True, -win_score, (0 if player == PLAYER else -1) + 2
+    if block_count == 1 and plies > 0:
+        best[level], best_moves_to_win[level] = -win_score, 100  # The block is forced, so there is no standing pat
+    else:
+        if score == SCORE_BOUND:
+            score, moves_to_win = evaluate_position_numba(board, move_count, directions, win_length, weights)
+        if plies == 0 or not threats.any():
+            return True, score, moves_to_win
+        drops[level] = threats
+        best[level], best_moves_to_win[level] = score, moves_to_win
+        if player == AI:
+            alphas[level] = max(alphas[level], score)
+        else:
+            betas[level] = min(betas[level], score)
+        if alphas[level] >= betas[level]:
+            return True, score, moves_to_win
+    next_drop[level] = 0
+    return False, 0, 0
+
+@jit(nopython=True, nogil=True, cache=True)
+def quiescence_numba(board, heights, player, alpha, beta, score, moves_to_win, move_count, plies,
+                     directions, win_length, weights, line_cells):
+    """Value of a leaf with player to move after resolving wins, forced blocks and double-threat drops.
+
+    heights holds the flattened column heights and is restored on return; score and
+    moves_to_win are the leaf's static eval. Iterative with an explicit stack, since cached
+    recursive kernels are not reliable in Numba.
+    """
+    n = board.shape[0]
+    columns = n * n
+    drops = np.zeros((plies + 1, columns), dtype=np.bool_)
+    players = np.zeros(plies + 1, dtype=np.int64)
+    alphas = np.zeros(plies + 1, dtype=np.int64)
+    betas = np.zeros(plies + 1, dtype=np.int64)
+    best = np.zeros(plies + 1, dtype=np.int64)
+    best_moves_to_win = np.zeros(plies + 1, dtype=np.int64)
+    next_drop = np.zeros(plies + 1, dtype=np.int64)
+    played = np.zeros(plies + 1, dtype=np.int64)
+    players[0], alphas[0], betas[0] = player, alpha, beta
+    done, value, value_moves_to_win = quiescence_node_numba(board, heights, 0, players, alphas, betas, score,
+                                                            moves_to_win, move_count, plies, directions, win_length,
+                                                            weights, line_cells, drops, best, best_moves_to_win,
+                                                            next_drop)
+    if done:
+        return value, value_moves_to_win
+    level = 0
+    while True:
+        column = next_drop[level]
+        while column < columns and not drops[level, column]:
+            column += 1
+        if column == columns:
+            # Node finished: hand its value to the parent
+            value, value_moves_to_win = best[level], best_moves_to_win[level]
+            if level == 0:
+                return value, value_moves_to_win
+            level -= 1
+            column = played[level]
+            heights[column] -= 1
+            board[column // n, column % n, heights[column]] = 0
+        else:
+            next_drop[level] = column + 1
+            played[level] = column
+            board[column // n, column % n, heights[column]] = players[level]
+            heights[column] += 1
+            players[level + 1] = -players[level]
+            alphas[level + 1], betas[level + 1] = alphas[level], betas[level]
+            done, value, value_moves_to_win = quiescence_node_numba(board, heights, level + 1, players, alphas, betas,
+                                                                    SCORE_BOUND, 100, move_count + level + 1,
+                                                                    plies - level - 1, directions, win_length, weights,
+                                                                    line_cells, drops, best, best_moves_to_win,
+                                                                    next_drop)
+            if not done:
+                level += 1
+                continue
+            heights[column] -= 1
+            board[column // n, column % n, heights[column]] = 0
+        # Merge the child's value into the node at this level
+        better = value > best[level] if players[level] == AI else value < best[level]
+        if better or (value == best[level] and value_moves_to_win + 1 < best_moves_to_win[level]):
+            best[level], best_moves_to_win[level] = value, value_moves_to_win + 1
+        if players[level] == AI:
+            alphas[level] = max(alphas[level], value)
+        else:
+            betas[level] = min(betas[level], value)
+        if alphas[level] >= betas[level]:
+            next_drop[level] = columns
+
+@jit(nopython=True, parallel=True, cache=True)
+def quiet_mask_numba(boards, directions, win_length):
+    """Marks boards where neither side can win on the next move"""
+    mask = np.zeros(boards.shape[0], dtype=np.bool_)
+    for i in prange(boards.shape[0]):
+        mask[i] = (count_winning_moves_numba(boards[i], PLAYER, directions, win_length) == 0 and
+                   count_winning_moves_numba(boards[i], AI, directions, win_length) == 0)
+    return mask
+
 def check_threats(player, move_count):
     """Wrapper for check_threats_numba"""
     moves = get_valid_moves()
-    valid_moves = np.array(moves, dtype=np.int32)
-    threats_array = check_threats_numba(board, player, valid_moves, move_count)
+    valid_moves = np.array(moves, dtype=np.int32).reshape(-1, 3)
+    threats_array = check_threats_numba(board, player, valid_moves, move_count, directions, WIN_LENGTH)
     return [(int(t[0]), int(t[1]), int(t[2]), int(t[3])) for t in threats_array]
 
-def minimax(depth, alpha, beta, maximizing, last_move=None, start_time=None, move_count=0):
-    """Minimax with alpha-beta pruning and iterative deepening"""
-    if start_time and time.time() - start_time > TIME_LIMIT:
+def store_entry(cache_key, score, moves_to_win, alpha, beta, best_move):
+    """Stores a search result with its bound type relative to the (alpha, beta) window it was searched with"""
+    bound = UPPER if score <= alpha else LOWER if score >= beta else EXACT
+    transposition_table[cache_key] = (score, moves_to_win, bound, best_move)
+    trim_table()
+
+def trim_table():
+    """Clears the table once it outgrows MAX_CACHE_SIZE; fixed-size tables such as shared_tt's replace entries instead"""
+    if isinstance(transposition_table, dict) and len(transposition_table) > MAX_CACHE_SIZE:
+        transposition_table.clear()
+
+def set_level(number, seed=0):
+    """Plays ai_move at LEVELS[number], or by TIME_LIMIT again for None; seed varies the evaluation noise"""
+    global level, eval_noise, noise_seed
+    if number is not None and number not in LEVELS:
+        raise ValueError(f"unknown level {number}; choose from {sorted(LEVELS)}")
+    level = None if number is None else LEVELS[number]
+    eval_noise = 0 if level is None else level["noise"]
+    noise_seed = seed
+
+def level_budget():
+    """Node budget per move of the active level on the current board"""
+    return int(level["nodes"] * (BOARD_SIZE ** 2 / 25) ** 2)
+
+def position_noise(h):
+    """Pseudo-random offset in [-eval_noise, eval_noise] that depends only on the position hash and noise_seed"""
+    h = (h ^ noise_seed) * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF
+    h ^= h >> 29
+    return h % (2 * eval_noise + 1) - eval_noise
+
+def default_max_depth(move_count):
+    """Depth cap for iterative deepening at this stage of the game"""
+    depth = EARLY_DEPTH_LIMIT if move_count < LATE_GAME_THRESHOLD else 6
+    return depth + SELECTIVE_DEPTH_BONUS if USE_NULL_MOVE or USE_LMR else depth
+
+def minimax(depth, alpha, beta, maximizing, last_move=None, deadline=None, move_count=0, allow_null=True):
+    """Minimax with alpha-beta pruning; returns (None, 100) past the deadline or node_limit, or once stop_search is set"""
+    global nodes_searched
+    if (deadline and time.time() > deadline) or (node_limit is not None and nodes_searched >= node_limit) or stop_search.is_set():
         return None, 100
+    nodes_searched += 1
 
-    board_hash = board.tobytes()
-    cache_key = (board_hash, depth, maximizing)
-    if cache_key in transposition_table:
-        return transposition_table[cache_key]
+    cache_key = (position_hash, depth, maximizing)
+    entry = transposition_table.get(cache_key)
+    if entry is not None:
+        score, moves_to_win, bound, _ = entry
+        if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+            return score, moves_to_win
+    alpha_orig, beta_orig = alpha, beta
 
     if last_move and check_win(PLAYER, last_move):
         return -100000, -1
@@ -241,70 +794,238 @@ def minimax(depth, alpha, beta, maximizing, last_move=None, start_time=None, mov
     if board_full():
         return 0, 0
     if depth == 0:
-        score, moves_to_win = evaluate_position(move_count)
+        score, moves_to_win = quiescence(AI if maximizing else PLAYER, move_count)
+        if eval_noise and abs(score) < 100000:
+            score += position_noise(position_hash)
         return score, moves_to_win
 
-    moves = get_valid_moves()
-    move_scores = []
-    for x, y, z in moves:
-        board[x - 1, y - 1, z - 1] = AI if maximizing else PLAYER
-        score, _ = evaluate_position(move_count + 1)
-        board[x - 1, y - 1, z - 1] = 0
-        move_scores.append((score, (x, y, z)))
-    move_scores.sort(key=lambda x: -x[0] if maximizing else x[0])
-    moves = [move for _, move in move_scores]
+    # Verified null move: let the opponent move twice and, if that still fails high, confirm it with
+    # a reduced real search, since passing is illegal. Under gravity zugzwang comes from lines waiting
+    # on a gap, so it is skipped while either side has one, and late in the game.
+    bound = beta if maximizing else alpha
+    if (USE_NULL_MOVE and allow_null and depth >= NULL_MOVE_MIN_DEPTH and move_count < LATE_GAME_THRESHOLD
+            and abs(bound) != float('inf')
+            and not has_threat_numba(board, AI, lines) and not has_threat_numba(board, PLAYER, lines)):
+        window = (bound - 1, bound) if maximizing else (bound, bound + 1)
+        score, _ = minimax(depth - 1 - NULL_MOVE_REDUCTION, window[0], window[1], not maximizing, None, deadline,
+                           move_count, False)
+        if score is None:
+            return None, 100
+        if (score >= beta) if maximizing else (score <= alpha):
+            score, moves_to_win = minimax(depth - NULL_MOVE_REDUCTION, alpha, beta, maximizing, last_move, deadline,
+                                          move_count, False)
+            if score is None:
+                return None, 100
+            if (score >= beta) if maximizing else (score <= alpha):
+                return score, moves_to_win
+
+    # One compiled pass gives ordering scores and, at depth 1, the leaf values themselves
+    valid_moves = get_valid_moves()
+    evals, values, leaf_moves_to_win = score_children_numba(board, np.array(valid_moves, dtype=np.int32), AI if maximizing else PLAYER,
+                                                            move_count, directions, WIN_LENGTH, weights, line_cells, QUIESCENCE_PLIES)
+    evals, values, leaf_moves_to_win = evals.tolist(), values.tolist(), leaf_moves_to_win.tolist()
+    order = sorted(range(len(valid_moves)), key=lambda i: -evals[i] if maximizing else evals[i])
+    if depth == 1:
+        nodes_searched += len(valid_moves)
+        if eval_noise:
+            side = 1 if maximizing else 0
+            values = [v + position_noise(position_hash ^ int(zobrist[x - 1, y - 1, z - 1, side])) if abs(v) < 100000 else v
+                      for v, (x, y, z) in zip(values, valid_moves)]
+    reduce_late = USE_LMR and depth >= LMR_MIN_DEPTH
+    if reduce_late:
+        tactical = tactical_moves_numba(board, np.array(valid_moves, dtype=np.int32), AI if maximizing else PLAYER,
+                                        lines).tolist()
 
     if maximizing:
         max_eval = -float('inf')
         best_moves_to_win = 100
-        for x, y, z in moves:
-            board[x - 1, y - 1, z - 1] = AI
-            eval, moves_to_win = minimax(depth - 1, alpha, beta, False, (x, y, z), start_time, move_count + 1)
-            board[x - 1, y - 1, z - 1] = 0
-            if eval is None:
-                return None, 100
+        best_move = None
+        for n, i in enumerate(order):
+            if depth == 1:
+                eval, moves_to_win = values[i], leaf_moves_to_win[i]
+            else:
+                x, y, z = valid_moves[i]
+                make_move(x, y, z, AI)
+                eval = None
+                if reduce_late and n >= LMR_FULL_MOVES and alpha != -float('inf') and not tactical[i]:
+                    # Late move: a reduced null-window search, redone in full only if it beats alpha
+                    eval, moves_to_win = minimax(depth - 1 - LMR_REDUCTION, alpha, alpha + 1, False, (x, y, z), deadline,
+                                                 move_count + 1)
+                    if eval is not None and eval > alpha:
+                        eval = None
+                    elif eval is None:
+                        undo_move(x, y, z)
+                        return None, 100
+                if eval is None:
+                    eval, moves_to_win = minimax(depth - 1, alpha, beta, False, (x, y, z), deadline, move_count + 1)
+                undo_move(x, y, z)
+                if eval is None:
+                    return None, 100
             if eval > max_eval or (eval == max_eval and moves_to_win < best_moves_to_win):
                 max_eval = eval
                 best_moves_to_win = moves_to_win + 1
+                best_move = valid_moves[i]
             alpha = max(alpha, eval)
             if beta <= alpha:
                 break
-        transposition_table[cache_key] = (max_eval, best_moves_to_win)
-        if len(transposition_table) > MAX_CACHE_SIZE:
-            transposition_table.clear()
+        store_entry(cache_key, max_eval, best_moves_to_win, alpha_orig, beta_orig, best_move)
         return max_eval, best_moves_to_win
     else:
         min_eval = float('inf')
         best_moves_to_win = 100
-        for x, y, z in moves:
-            board[x - 1, y - 1, z - 1] = PLAYER
-            eval, moves_to_win = minimax(depth - 1, alpha, beta, True, (x, y, z), start_time, move_count + 1)
-            board[x - 1, y - 1, z - 1] = 0
-            if eval is None:
-                return None, 100
+        best_move = None
+        for n, i in enumerate(order):
+            if depth == 1:
+                eval, moves_to_win = values[i], leaf_moves_to_win[i]
+            else:
+                x, y, z = valid_moves[i]
+                make_move(x, y, z, PLAYER)
+                eval = None
+                if reduce_late and n >= LMR_FULL_MOVES and beta != float('inf') and not tactical[i]:
+                    # Late move: a reduced null-window search, redone in full only if it gets under beta
+                    eval, moves_to_win = minimax(depth - 1 - LMR_REDUCTION, beta - 1, beta, True, (x, y, z), deadline,
+                                                 move_count + 1)
+                    if eval is not None and eval < beta:
+                        eval = None
+                    elif eval is None:
+                        undo_move(x, y, z)
+                        return None, 100
+                if eval is None:
+                    eval, moves_to_win = minimax(depth - 1, alpha, beta, True, (x, y, z), deadline, move_count + 1)
+                undo_move(x, y, z)
+                if eval is None:
+                    return None, 100
             if eval < min_eval or (eval == min_eval and moves_to_win < best_moves_to_win):
                 min_eval = eval
                 best_moves_to_win = moves_to_win + 1
+                best_move = valid_moves[i]
             beta = min(beta, eval)
             if beta <= alpha:
                 break
-        transposition_table[cache_key] = (min_eval, best_moves_to_win)
-        if len(transposition_table) > MAX_CACHE_SIZE:
-            transposition_table.clear()
+        store_entry(cache_key, min_eval, best_moves_to_win, alpha_orig, beta_orig, best_move)
         return min_eval, best_moves_to_win
 
-def ai_move():
-    """Chooses the best move for AI"""
-    if len(transposition_table) > MAX_CACHE_SIZE:
-        transposition_table.clear()
+def principal_variation(move, player, depth):
+    """Follows best moves stored in the transposition table from the position after move"""
+    pv = [move]
+    make_move(*move, player)
+    mover = player
+    while depth > 0 and not check_win(mover, pv[-1]) and not board_full():
+        mover = -mover
+        entry = transposition_table.get((position_hash, depth, mover == AI))
+        if entry is None or entry[3] is None or not valid_move(*entry[3]):
+            break
+        pv.append(entry[3])
+        make_move(*entry[3], mover)
+        depth -= 1
+    for x, y, z in reversed(pv):
+        undo_move(x, y, z)
+    return pv
+
+def search_root(moves, depth, k, player, deadline, move_count):
+    """Searches root moves for player, returning exact results for the best k and bounds for the rest.
+
+    The first k moves get a full window. Every later move is searched with a
+    window that starts at the current k-th best score, so a weaker move only
+    needs to be refuted, and a stronger one comes back exact. Returns
+    (lines, scores, complete), where lines lists (score, moves_to_win, move)
+    best-first from player's point of view and scores maps every move to its
+    value or bound, for ordering the next iteration. When minimax gives up,
+    complete is False and both cover only the moves searched before that.
+    """
+    sign = 1 if player == AI else -1
+    lines = []
+    scores = {}
+    for move in moves:
+        make_move(*move, player)
+        if len(lines) < k:
+            alpha, beta = -float('inf'), float('inf')
+        elif player == AI:
+            alpha, beta = lines[-1][0], float('inf')
+        else:
+            alpha, beta = -float('inf'), -lines[-1][0]
+        score, moves_to_win = minimax(depth, alpha, beta, player == PLAYER, move, deadline, move_count + 1)
+        undo_move(*move)
+        if score is None:
+            return lines, scores, False
+        scores[move] = sign * score
+        if len(lines) < k or sign * score > lines[-1][0]:
+            lines.append((sign * score, moves_to_win, move))
+            lines.sort(key=lambda line: (-line[0], line[1]))
+            del lines[k:]
+    return lines, scores, True
+
+def search_iter(k=1, max_depth=None, time_limit=None, player=AI, max_nodes=None):
+    """Iterative deepening as a generator, yielding after every completed depth.
+
+    Each result is a dict with depth, move, score, moves_to_win, nodes,
+    elapsed (seconds) and complete for the best move, plus lines, the top-k
+    list from analyze. The board is back in its original state whenever the generator
+    is suspended, so the caller can stop at any point and keep the latest
+    result. An iteration cut short by time_limit or stop_search is
+    discarded. One cut short by max_nodes is yielded with complete False if
+    any root move finished: moves are searched best-first, so the best of
+    those is at least as sound a choice as the previous iteration's, and
+    no part of the node budget is wasted.
+    """
+    global node_limit
+    moves = get_valid_moves()
+    if not moves:
+        return
+    move_count = int(np.count_nonzero(board))
+    if max_depth is None:
+        max_depth = default_max_depth(move_count)
+    start_time = time.time()
+    deadline = start_time + (TIME_LIMIT if time_limit is None else time_limit)
+    start_nodes = nodes_searched
+    moves.sort(key=lambda m: m[2])  # Low moves first until there are scores to order by
+    depth = 1
+    while depth <= max_depth and time.time() < deadline:
+        node_limit = None if max_nodes is None else start_nodes + max_nodes
+        try:
+            lines, scores, complete = search_root(moves, depth, k, player, deadline, move_count)
+            out_of_nodes = node_limit is not None and nodes_searched >= node_limit
+        finally:
+            node_limit = None
+        if not lines or not (complete or out_of_nodes):
+            return
+        lines = [{"move": move, "score": score, "moves_to_win": moves_to_win,
+                  "pv": principal_variation(move, player, depth), "depth": depth}
+                 for score, moves_to_win, move in lines]
+        yield {"depth": depth, "move": lines[0]["move"], "score": lines[0]["score"],
+               "moves_to_win": lines[0]["moves_to_win"], "nodes": nodes_searched - start_nodes,
+               "elapsed": time.time() - start_time, "lines": lines, "complete": complete}
+        if not complete:
+            return
+        moves.sort(key=lambda m: -scores[m])  # Best moves first next iteration
+        depth += 1
+
+def analyze(k=3, max_depth=None, time_limit=None, player=AI):
+    """Returns the top-k root moves for player after iterative deepening.
+
+    Each result is a dict with move, score (higher is better for player),
+    moves_to_win, pv (principal variation, starting with move) and the depth
+    of the last completed iteration. The transposition table is shared by all
+    root moves and iterations, so k lines cost little more than one search.
+    """
+    lines = []
+    for info in search_iter(k, max_depth, time_limit, player):
+        lines = info["lines"]
+    return lines
+
+def ai_move(on_iteration=None):
+    """Chooses the best move for AI; on_iteration gets each search_iter result as it completes"""
+    global transposition_table
+    trim_table()
 
     moves = get_valid_moves()
     move_count = np.sum(board != 0)
 
     # First move: take center
+    center = (BOARD_SIZE + 1) // 2
     if move_count == 0:
         print("AI takes center for first move")
-        return 3, 3, 1
+        return center, center, 1
 
     # # Early game: prioritize edge-adjacent positions if center is taken
     # if move_count < 5:
@@ -316,21 +1037,21 @@ def ai_move():
 
     # Immediate win for AI
     for x, y, z in moves:
-        board[x - 1, y - 1, z - 1] = AI
+        make_move(x, y, z, AI)
         if check_win(AI, (x, y, z)):
-            board[x - 1, y - 1, z - 1] = 0
+            undo_move(x, y, z)
             print(f"AI wins with move ({x}, {y}, {z})")
             return x, y, z
-        board[x - 1, y - 1, z - 1] = 0
+        undo_move(x, y, z)
 
     # Block player's immediate win
     for x, y, z in moves:
-        board[x - 1, y - 1, z - 1] = PLAYER
+        make_move(x, y, z, PLAYER)
         if check_win(PLAYER, (x, y, z)):
-            board[x - 1, y - 1, z - 1] = 0
+            undo_move(x, y, z)
             print(f"AI blocks player's win at ({x}, {y}, {z})")
             return x, y, z
-        board[x - 1, y - 1, z - 1] = 0
+        undo_move(x, y, z)
 
     # Create or block triple threats
     ai_threats = check_threats(AI, move_count)
@@ -346,91 +1067,68 @@ def ai_move():
         return player_threats[0][0], player_threats[0][1], player_threats[0][2]
 
     # Iterative deepening with minimax
-    start_time = time.time()
-    best_score = -float('inf')
     best_move = None
-    best_moves_to_win = 100
-    depth = 1
-    max_depth = EARLY_DEPTH_LIMIT if move_count < LATE_GAME_THRESHOLD else 6
-    while depth <= max_depth and time.time() - start_time < TIME_LIMIT:
-        current_best_score = -float('inf')
-        current_best_move = None
-        current_best_moves_to_win = 100
-        moves.sort(key=lambda m: (evaluate_position(move_count)[0], m[2]))
-        for x, y, z in moves:
-            board[x - 1, y - 1, z - 1] = AI
-            score, moves_to_win = minimax(depth, -float('inf'), float('inf'), False, (x, y, z), start_time, move_count + 1)
-            board[x - 1, y - 1, z - 1] = 0
-            if score is None:
-                break
-            if score > current_best_score or (score == current_best_score and moves_to_win < current_best_moves_to_win):
-                current_best_score = score
-                current_best_move = (x, y, z)
-                current_best_moves_to_win = moves_to_win
-        if score is not None:
-            best_score = current_best_score
-            best_move = current_best_move
-            best_moves_to_win = current_best_moves_to_win
-        depth += 1
+    table = transposition_table
+    if level is None:
+        searches = search_iter(1, default_max_depth(move_count))
+    else:
+        # Only the node budget ends the search, and a fresh table keeps earlier moves (and the
+        # noise) out of it, so the reply depends on nothing but the position, level and seed
+        transposition_table = {}
+        searches = search_iter(1, level["depth"] or BOARD_SIZE ** 3, float('inf'), AI, level_budget())
+    try:
+        for info in searches:
+            best_move = info["move"]
+            if on_iteration:
+                on_iteration(info)
+    finally:
+        transposition_table = table
 
     # Fallback: take center if available
-    if not best_move and (3, 3, 3) in moves:
-        print("AI takes center (3, 3, 3)")
-        return 3, 3, 3
+    if not best_move and (center, center, center) in moves:
+        print(f"AI takes center {(center, center, center)}")
+        return center, center, center
 
     print(f"AI chooses move {best_move} with minimax")
     return best_move if best_move else moves[0]
 
+def engine_move_for(player, on_iteration=None):
+    """ai_move for either side, with its output silenced; for engine-vs-engine games"""
+    # ai_move always plays AI, so flip the colours when it is PLAYER's turn
+    if player == PLAYER:
+        set_board(-board)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return ai_move(on_iteration)
+    finally:
+        if player == PLAYER:
+            set_board(-board)
+
+def random_opening(plies, rng):
+    """Plays plies random legal moves from the current board, stopping short of a win; returns the side to move"""
+    player = PLAYER
+    for _ in range(plies):
+        moves = get_valid_moves()
+        if not moves:
+            break
+        x, y, z = moves[rng.integers(len(moves))]
+        make_move(x, y, z, player)
+        if check_win(player, (x, y, z)):
+            undo_move(x, y, z)
+            break
+        player = -player
+    return player
+
 def get_winning_combination():
     """Returns the coordinates of the winning combination if there is one."""
-    # Check all possible winning combinations
-    for x in range(1, 6):
-        for y in range(1, 6):
-            for z in range(1, 6):
-                # Check horizontal
-                if x <= 2:
-                    if all(board[x+i-1, y-1, z-1] == board[x-1, y-1, z-1] != 0 for i in range(4)):
-                        return [(x+i, y, z) for i in range(4)]
-                # Check vertical
-                if y <= 2:
-                    if all(board[x-1, y+i-1, z-1] == board[x-1, y-1, z-1] != 0 for i in range(4)):
-                        return [(x, y+i, z) for i in range(4)]
-                # Check depth
-                if z <= 2:
-                    if all(board[x-1, y-1, z+i-1] == board[x-1, y-1, z-1] != 0 for i in range(4)):
-                        return [(x, y, z+i) for i in range(4)]
-                # Check diagonal in xy plane
-                if x <= 2 and y <= 2:
-                    if all(board[x+i-1, y+i-1, z-1] == board[x-1, y-1, z-1] != 0 for i in range(4)):
-                        return [(x+i, y+i, z) for i in range(4)]
-                    if all(board[x+i-1, y+3-i-1, z-1] == board[x-1, y+3-1, z-1] != 0 for i in range(4)):
-                        return [(x+i, y+3-i, z) for i in range(4)]
-                # Check diagonal in xz plane
-                if x <= 2 and z <= 2:
-                    if all(board[x+i-1, y-1, z+i-1] == board[x-1, y-1, z-1] != 0 for i in range(4)):
-                        return [(x+i, y, z+i) for i in range(4)]
-                    if all(board[x+i-1, y-1, z+3-i-1] == board[x-1, y-1, z+3-1] != 0 for i in range(4)):
-                        return [(x+i, y, z+3-i) for i in range(4)]
-                # Check diagonal in yz plane
-                if y <= 2 and z <= 2:
-                    if all(board[x-1, y+i-1, z+i-1] == board[x-1, y-1, z-1] != 0 for i in range(4)):
-                        return [(x, y+i, z+i) for i in range(4)]
-                    if all(board[x-1, y+i-1, z+3-i-1] == board[x-1, y-1, z+3-1] != 0 for i in range(4)):
-                        return [(x, y+i, z+3-i) for i in range(4)]
-                # Check 3D diagonals
-                if x <= 2 and y <= 2 and z <= 2:
-                    if all(board[x+i-1, y+i-1, z+i-1] == board[x-1, y-1, z-1] != 0 for i in range(4)):
-                        return [(x+i, y+i, z+i) for i in range(4)]
-                    if all(board[x+i-1, y+i-1, z+3-i-1] == board[x-1, y-1, z+3-1] != 0 for i in range(4)):
-                        return [(x+i, y+i, z+3-i) for i in range(4)]
-                    if all(board[x+i-1, y+3-i-1, z+i-1] == board[x-1, y+3-1, z-1] != 0 for i in range(4)):
-                        return [(x+i, y+3-i, z+i) for i in range(4)]
-                    if all(board[x+i-1, y+3-i-1, z+3-i-1] == board[x-1, y+3-1, z+3-1] != 0 for i in range(4)):
-                        return [(x+i, y+3-i, z+3-i) for i in range(4)]
-    return None
+    values = board[lines[..., 0], lines[..., 1], lines[..., 2]]
+    won = (values[:, 0] != 0) & np.all(values == values[:, :1], axis=1)
+    if not won.any():
+        return None
+    return [(int(x) + 1, int(y) + 1, int(z) + 1) for x, y, z in lines[np.argmax(won)]]
 
 def main():
-    print("Welcome to 3D Connect-4 (5x5x5)!")
+    print(f"Welcome to 3D Connect-4 ({BOARD_SIZE}x{BOARD_SIZE}x{BOARD_SIZE})!")
     first = input("Who goes first? (player/ai): ").lower()
     player_turn = first == 'player'
 
@@ -0,0 +1,102 @@
+import argparse
+import time
+import numpy as np
+import minimax
+
+# Named engine settings; a config is a "+"-separated list of these, or "base" for plain alpha-beta.
+# "q<N>" sets the quiescence plies, which otherwise keep the engine default.
+FEATURES = {"null": "USE_NULL_MOVE", "lmr": "USE_LMR"}
+SETTINGS = list(FEATURES.values()) + ["QUIESCENCE_PLIES"]
+
+def parse_config(name):
+    """Turns "null+lmr+q2" into {"USE_NULL_MOVE": True, "USE_LMR": True, "QUIESCENCE_PLIES": 2}, with the rest off"""
+    parts = set() if name == "base" else set(name.split("+"))
+    config = {flag: feature in parts for feature, flag in FEATURES.items()}
+    config["QUIESCENCE_PLIES"] = minimax.QUIESCENCE_PLIES
+    for part in parts - set(FEATURES):
+        if part[:1] != "q" or not part[1:].isdigit():
+            raise ValueError(f"unknown search feature: {part}")
+        config["QUIESCENCE_PLIES"] = int(part[1:])
+    return config
+
+class EngineStats:
+    def __init__(self):
+        self.moves = 0  # Moves that reached the iterative-deepening search
+        self.depth = 0
+        self.nodes = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        n = max(self.moves, 1)
+        return {"searched_moves": self.moves, "avg_depth": round(self.depth / n, 2),
+                "avg_nodes": round(self.nodes / n), "avg_ms": round(self.elapsed / n * 1000, 1)}
+
+def engine_move(config, player, stats):
+    """Plays ai_move for player with the config's search flags, updating stats"""
+    for flag, value in config.items():
+        setattr(minimax, flag, value)
+    minimax.transposition_table.clear()  # Neither side may reuse the other's search
+    infos = []
+    start = time.perf_counter()
+    move = minimax.engine_move_for(player, infos.append)
+    elapsed = time.perf_counter() - start
+    if infos:
+        stats.moves += 1
+        stats.depth += infos[-1]["depth"]
+        stats.nodes += infos[-1]["nodes"]
+        stats.elapsed += elapsed
+    return move
+
+def play_game(configs, stats, random_plies, rng):
+    """Plays one game, configs[0] moving first; returns the index of the winning config or None"""
+    size = minimax.BOARD_SIZE
+    minimax.set_board(np.zeros((size, size, size), dtype=np.int32))
+    player, side = minimax.PLAYER, 0
+    for ply in range(size ** 3):
+        if ply < random_plies:
+            valid = minimax.get_valid_moves()
+            move = valid[rng.integers(len(valid))]
+        else:
+            move = engine_move(configs[side], player, stats[side])
+        minimax.make_move(*move, player)
+        if minimax.check_win(player, move):
+            return side
+        player, side = -player, 1 - side
+    return None
+
+def match(a, b, games, time_limit, random_plies=2, seed=0):
+    """Plays a against b with alternating colours, sharing random openings between each pair of games"""
+    configs = (parse_config(a), parse_config(b))
+    stats = (EngineStats(), EngineStats())
+    minimax.TIME_LIMIT = time_limit
+    results = {a: 0, b: 0, "draw": 0}
+    for game in range(games):
+        # Both colour assignments of an opening use the same seed
+        rng = np.random.default_rng(seed + game // 2)
+        order = (0, 1) if game % 2 == 0 else (1, 0)
+        winner = play_game([configs[i] for i in order], [stats[i] for i in order], random_plies, rng)
+        results["draw" if winner is None else (a, b)[order[winner]]] += 1
+    return results, {a: stats[0].summary(), b: stats[1].summary()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine configurations against each other")
+    parser.add_argument("a", nargs="?", default="null+lmr", help='search features, e.g. "null+lmr", "lmr+q0" or "base"')
+    parser.add_argument("b", nargs="?", default="base")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--time", type=float, default=minimax.TIME_LIMIT, help="seconds per move")
+    parser.add_argument("--random-plies", type=int, default=2, help="random opening moves per game")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    flags = {flag: getattr(minimax, flag) for flag in SETTINGS}
+    try:
+        results, stats = match(args.a, args.b, args.games, args.time, args.random_plies, args.seed)
+    finally:
+        for flag, value in flags.items():
+            setattr(minimax, flag, value)
+    print(f"{args.a} vs {args.b}: {results[args.a]}-{results[args.b]}, {results['draw']} draws")
+    for name, summary in stats.items():
+        print(f"  {name}: " + ", ".join(f"{key} {value}" for key, value in summary.items()))
+
+if __name__ == "__main__":
+    main()
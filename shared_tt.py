@@ -0,0 +1,160 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import minimax
+
+# Layout: a 16-byte header (magic, slot count, board size, win length), then slots of two
+# uint64 words, (key ^ data, data). Writers store both words without locking; a reader only
+# accepts a slot whose words XOR back to the key it is probing, so a slot torn by a
+# concurrent write, or holding another position, reads as a miss.
+MAGIC = 0x43345454  # "C4TT"
+MASK64 = (1 << 64) - 1
+VALID = 1 << 63  # Set in every stored data word, so zeroed slots never verify
+NO_MOVE = 0xFFFF
+
+def table_key(cache_key):
+    """Folds minimax's (hash, depth, maximizing) cache key into one 64-bit key"""
+    position_hash, depth, maximizing = cache_key
+    return (position_hash ^ (depth * 0x9E3779B97F4A7C15 + (0xD1B54A32D192ED69 if maximizing else 0))) & MASK64
+
+class SharedTranspositionTable:
+    """Fixed-size, lock-free transposition table in shared memory.
+
+    Drop-in for minimax.transposition_table: several engine processes attach to the same
+    table by name and see each other's results. Entries are always replaced, never cleared
+    to make room. All processes must use the same board size, Zobrist seed and weights.
+    """
+
+    def __init__(self, name=None, slots=1 << 20):
+        if name is None:
+            if slots & (slots - 1):
+                raise ValueError("slots must be a power of two")
+            if minimax.BOARD_SIZE ** 3 >= NO_MOVE:
+                raise ValueError("board too large for the shared table's move encoding")
+            self.shm = shared_memory.SharedMemory(create=True, size=(slots + 1) * 16)
+            self.owner = True
+            header = np.ndarray(2, dtype=np.uint64, buffer=self.shm.buf)
+            header[0] = MAGIC << 32 | slots.bit_length() - 1
+            header[1] = minimax.BOARD_SIZE << 8 | minimax.WIN_LENGTH
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+            header = np.ndarray(2, dtype=np.uint64, buffer=self.shm.buf)
+            if int(header[0]) >> 32 != MAGIC:
+                raise ValueError(f"{name} is not a shared transposition table")
+            if int(header[1]) != minimax.BOARD_SIZE << 8 | minimax.WIN_LENGTH:
+                raise ValueError("shared table was created for a different board configuration")
+            slots = 1 << (int(header[0]) & 0xFF)
+        self.name = self.shm.name
+        self.mask = slots - 1
+        self.words = np.ndarray((slots + 1, 2), dtype=np.uint64, buffer=self.shm.buf)[1:]
+
+    def get(self, cache_key, default=None):
+        key = table_key(cache_key)
+        slot = self.words[key & self.mask]
+        check, data = int(slot[0]), int(slot[1])
+        if check ^ data != key or not data & VALID:
+            return default
+        score = (data & 0xFFFFFFFF) - (1 << 31)
+        moves_to_win = (data >> 32 & 0xFF) - 128
+        bound = data >> 40 & 0x3
+        move = data >> 42 & 0xFFFF
+        if move == NO_MOVE:
+            best_move = None
+        else:
+            n = minimax.BOARD_SIZE
+            best_move = (move // (n * n) + 1, move // n % n + 1, move % n + 1)
+        return score, moves_to_win, bound, best_move
+
+    def __setitem__(self, cache_key, entry):
+        score, moves_to_win, bound, best_move = entry
+        if best_move is None:
+            move = NO_MOVE
+        else:
+            n = minimax.BOARD_SIZE
+            x, y, z = best_move
+            move = ((x - 1) * n + y - 1) * n + z - 1
+        data = (VALID | move << 42 | bound << 40 | (min(max(int(moves_to_win), -128), 127) + 128) << 32 |
+                (int(score) + (1 << 31)) & 0xFFFFFFFF)
+        key = table_key(cache_key)
+        slot = self.words[key & self.mask]
+        slot[1] = data
+        slot[0] = key ^ data
+
+    def clear(self):
+        self.words[:] = 0
+
+    def close(self):
+        """Detaches this process; the creating process also frees the shared memory"""
+        self.words = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def use_shared_table(name):
+    """Attaches to a shared table and makes it this process's transposition table; for pool initializers"""
+    minimax.transposition_table = SharedTranspositionTable(name)
+
+def _init_worker(name):
+    if name:
+        use_shared_table(name)
+
+def _search_position(state, depth, shared):
+    """Fixed-depth search of one position for the benchmark; returns (best move, nodes)"""
+    if not shared:
+        minimax.transposition_table.clear()
+    minimax.set_board(np.array(state, dtype=np.int32))
+    minimax.nodes_searched = 0
+    info = None
+    for info in minimax.search_iter(1, depth, 1e9):
+        pass
+    return info["move"], minimax.nodes_searched
+
+def bench(workers, positions, plies, depth, shared, seed=0):
+    """Has every worker search the same random positions at once; returns (total nodes, seconds)"""
+    rng = np.random.default_rng(seed)
+    states = []
+    for _ in range(positions):
+        minimax.set_board(np.zeros((minimax.BOARD_SIZE,) * 3, dtype=np.int32))
+        player = minimax.random_opening(plies, rng)
+        # Searched from the AI's side
+        states.append((minimax.board if player == minimax.AI else -minimax.board).tolist())
+    table = SharedTranspositionTable() if shared else None
+    nodes, elapsed = 0, 0.0
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(table.name if table else None,)) as pool:
+            list(pool.map(_search_position, states[:1] * workers, [1] * workers, [shared] * workers))  # Compile first
+            for state in states:
+                if table:
+                    table.clear()
+                start = time.perf_counter()
+                results = list(pool.map(_search_position, [state] * workers, [depth] * workers, [shared] * workers))
+                elapsed += time.perf_counter() - start
+                nodes += sum(n for _, n in results)
+    finally:
+        if table:
+            table.close()
+    return nodes, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare private and shared transposition tables across worker processes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--positions", type=int, default=4)
+    parser.add_argument("--plies", type=int, default=10, help="random moves leading to each position")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for shared in (False, True):
+        nodes, elapsed = bench(args.workers, args.positions, args.plies, args.depth, shared, args.seed)
+        print(f"{'shared' if shared else 'private':>8}: {nodes:>10} nodes, {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
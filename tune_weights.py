@@ -0,0 +1,172 @@
+import argparse
+import contextlib
+import json
+import numpy as np
+import minimax
+from game_records import GameRecordFile
+
+TUNED = [i for i, name in enumerate(minimax.WEIGHT_NAMES) if name != "win"]  # Wins stay pinned to the search's terminal score
+RECORD_DTYPE = np.dtype([("features", np.float32, minimax.N_WEIGHTS), ("result", np.float32)])
+
+def selfplay(path, games, time_limit=0.05, random_plies=4, seed=0):
+    """Plays AI-vs-AI games and appends them to a game log.
+
+    Paths ending in .c4r get binary game records; anything else gets JSON
+    lines of {"moves": [[x, y, z], ...], "result": 1 | -1 | 0}, with the
+    result from PLAYER's point of view (1: PLAYER won, -1: AI won).
+    """
+    rng = np.random.default_rng(seed)
+    size = minimax.BOARD_SIZE
+    minimax.TIME_LIMIT = time_limit
+    records = GameRecordFile(path) if path.endswith(".c4r") else None
+    with contextlib.nullcontext() if records else open(path, 'a') as f:
+        for _ in range(games):
+            minimax.set_board(np.zeros((size, size, size), dtype=np.int32))
+            moves, result, player = [], 0, minimax.PLAYER
+            while True:
+                if len(moves) < random_plies:
+                    valid = minimax.get_valid_moves()
+                    move = valid[rng.integers(len(valid))]
+                else:
+                    move = minimax.engine_move_for(player)
+                minimax.make_move(*move, player)
+                moves.append([int(v) for v in move])
+                if minimax.check_win(player, move):
+                    result = player
+                    break
+                if minimax.board_full():
+                    break
+                player = -player
+            if records:
+                records.append([tuple(move) for move in moves], result)
+            else:
+                f.write(json.dumps({"moves": moves, "result": result}) + "\n")
+
+def read_games(path):
+    """Yields (moves, result, first mover) from a .c4r record file or a JSON-lines game log"""
+    if path.endswith(".c4r"):
+        for record in GameRecordFile(path):
+            yield record.moves, record.result, record.first
+        return
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                game = json.loads(line)
+                yield game["moves"], game["result"], game.get("first", minimax.PLAYER)
+
+def iter_positions(path, skip_plies, chunk_size):
+    """Replays every game and yields (boards, move_counts, results) chunks of positions"""
+    size = minimax.BOARD_SIZE
+    boards = np.zeros((chunk_size, size, size, size), dtype=np.int32)
+    results = np.zeros(chunk_size, dtype=np.float32)
+    count = 0
+    for moves, result, first in read_games(path):
+        board = np.zeros((size, size, size), dtype=np.int32)
+        player = first
+        for ply, (x, y, z) in enumerate(moves):
+            board[x - 1, y - 1, z - 1] = player
+            player = -player
+            if ply + 1 < skip_plies or ply + 1 == len(moves):
+                continue
+            boards[count] = board
+            results[count] = (result + 1) / 2  # 1: PLAYER won, 0.5: draw, 0: AI won
+            count += 1
+            if count == chunk_size:
+                yield boards, np.count_nonzero(boards.reshape(count, -1), axis=1), results
+                count = 0
+    if count:
+        yield boards[:count], np.count_nonzero(boards[:count].reshape(count, -1), axis=1), results[:count]
+
+def extract(games_path, records_path, skip_plies=6, chunk_size=65536):
+    """Writes features and results of quiet positions to a flat binary file, one chunk at a time"""
+    total = 0
+    with open(records_path, 'wb') as f:
+        for boards, move_counts, results in iter_positions(games_path, skip_plies, chunk_size):
+            quiet = minimax.quiet_mask_numba(boards, minimax.directions, minimax.WIN_LENGTH)
+            if not quiet.any():
+                continue
+            records = np.zeros(int(quiet.sum()), dtype=RECORD_DTYPE)
+            records["features"] = minimax.position_features_batch_numba(
+                np.ascontiguousarray(boards[quiet]), move_counts[quiet], minimax.directions, minimax.WIN_LENGTH)
+            records["result"] = results[quiet]
+            records.tofile(f)
+            total += len(records)
+    return total
+
+def iter_records(records_path, chunk_size):
+    """Streams (features, results) chunks from a memory-mapped record file"""
+    records = np.memmap(records_path, dtype=RECORD_DTYPE, mode='r')
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        yield chunk["features"].astype(np.float64), chunk["result"].astype(np.float64)
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -500, 500)))
+
+def loss(records_path, weights, k, chunk_size):
+    """Mean squared error between game results and sigmoid(k * eval) over all records"""
+    total, count = 0.0, 0
+    for features, results in iter_records(records_path, chunk_size):
+        total += np.sum((results - sigmoid(k * features @ weights)) ** 2)
+        count += len(results)
+    return total / max(count, 1)
+
+def fit_k(records_path, weights, chunk_size):
+    """Finds the eval-to-probability scale k that best fits the current weights"""
+    candidates = np.logspace(-7, -2, 41)
+    losses = [loss(records_path, weights, k, chunk_size) for k in candidates]
+    return float(candidates[int(np.argmin(losses))])
+
+def tune(records_path, epochs=50, lr=0.02, chunk_size=65536, initial=None, verbose=True):
+    """Texel-style tuning: Adam on the mean squared error, one streamed full-data gradient per epoch"""
+    weights = np.array(initial if initial is not None else minimax.DEFAULT_WEIGHTS, dtype=np.float64)
+    k = fit_k(records_path, weights, chunk_size)
+    step = lr * np.maximum(np.abs(weights), 1.0)  # Per-weight step so small and large weights move alike
+    m = np.zeros_like(weights)
+    v = np.zeros_like(weights)
+    if verbose:
+        print(f"k = {k:.3g}, initial loss {loss(records_path, weights, k, chunk_size):.6f}")
+    for epoch in range(1, epochs + 1):
+        grad = np.zeros_like(weights)
+        count = 0
+        for features, results in iter_records(records_path, chunk_size):
+            p = sigmoid(k * features @ weights)
+            grad += features.T @ (-2.0 * (results - p) * p * (1.0 - p) * k)
+            count += len(results)
+        grad /= max(count, 1)
+        grad[[i for i in range(len(weights)) if i not in TUNED]] = 0.0
+        m = 0.9 * m + 0.1 * grad
+        v = 0.999 * v + 0.001 * grad * grad
+        m_hat = m / (1 - 0.9 ** epoch)
+        v_hat = v / (1 - 0.999 ** epoch)
+        weights -= step * m_hat / (np.sqrt(v_hat) + 1e-12)
+        if verbose and (epoch % 10 == 0 or epoch == epochs):
+            print(f"epoch {epoch}: loss {loss(records_path, weights, k, chunk_size):.6f}")
+    return np.round(weights).astype(np.int64)
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune evaluation weights against recorded game outcomes")
+    parser.add_argument("games", help="game log to tune on, .c4r records or JSON lines (appended to by --selfplay)")
+    parser.add_argument("--selfplay", type=int, default=0, help="first play this many AI-vs-AI games into the log")
+    parser.add_argument("--selfplay-time", type=float, default=0.05, help="seconds per self-play move")
+    parser.add_argument("--skip-plies", type=int, default=6, help="ignore positions from the opening")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--lr", type=float, default=0.02)
+    parser.add_argument("--chunk-size", type=int, default=65536, help="positions held in memory at once")
+    parser.add_argument("--records", default=None, help="feature file (default: <games>.features)")
+    parser.add_argument("--out", default=minimax.WEIGHTS_FILE)
+    args = parser.parse_args()
+
+    if args.selfplay:
+        selfplay(args.games, args.selfplay, args.selfplay_time)
+    records_path = args.records or args.games + ".features"
+    count = extract(args.games, records_path, args.skip_plies, args.chunk_size)
+    print(f"{count} quiet positions")
+    if not count:
+        return
+    tuned = tune(records_path, args.epochs, args.lr, args.chunk_size, initial=minimax.weights)
+    minimax.save_weights(tuned, args.out)
+    print(f"wrote {args.out}: {dict(zip(minimax.WEIGHT_NAMES, tuned.tolist()))}")
+
+if __name__ == "__main__":
+    main()